@@ -1,26 +1,60 @@
 # ALERT: ALL of these imports are EXTREMELY important, they are a BIG DEAL
 
+from __future__ import annotations
 import os
 import json
-import matplotlib
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
-import tkinter as tk
-from tkinter import ttk
+import csv
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import math
 import argparse
 import sys
 import pathlib
 from pathlib import Path
 import re
-from copy import deepcopy
 import itertools
 import threading
+import queue
+import traceback
 from concurrent.futures import ThreadPoolExecutor
-from scipy.stats import gaussian_kde
-import inspect
+from collections import OrderedDict, deque
+import atexit
+import tempfile
+import struct
+import zlib
 from time import perf_counter
+from datetime import datetime
+from contextlib import contextmanager
+
+# matches report filenames with a run index (e.g. benchmark-3-report.json), see ReportDataStore.add_file
+REPORT_INDEX_REGEX = r'^(.*?)-(\d+)-report.json$'
+# directory (created next to the reports) that stores decoded reports, see ReportCache
+REPORT_CACHE_DIRNAME = '__reportcache__'
+# bump this whenever the layout of cache entries changes, so that old entries are rebuilt
+REPORT_CACHE_VERSION = 3
+REPORT_ARCHIVE_MAGIC = b'CSTLRPA\0'
+REPORT_ARCHIVE_VERSION = 2 # version 1 archives (without timing sketches) can still be read
+# SQLite index of report headers from all opened directories, see ReportIndex
+REPORT_INDEX_PATH = Path.home() / '.constellation' / 'report-index.sqlite3'
+# bump this whenever columns of the index change, the index is then rebuilt from scratch
+REPORT_INDEX_VERSION = 1
+# how often (ms) the Tk thread runs functions passed to ReportAnalyzer.call_in_ui by other threads
+UI_QUEUE_POLL_INTERVAL = 20
+# top-level report fields that are kept after parsing (everything except `Timings` and `SimulationConfig`)
+REPORT_HEADER_FIELDS = ['ReportVersion', 'ConstellationVersion', 'ReportDateTime', 'BuiltPlayer', 'DisplayResolution',
+                        'FullscreenMode', 'BenchmarkConfigName', 'CooldownDuration', 'WarmupDuration', 'DeviceModel',
+                        'OperatingSystem', 'ExecutableLocation', 'Summary']
+
+def import_gui_modules():
+    """tkinter and matplotlib are only imported for the GUI, headless commands should work without them. pyplot is
+    not used at all, figures are made with matplotlib.figure.Figure"""
+    global matplotlib, Figure, FigureCanvasTkAgg, NavigationToolbar2Tk, tk, ttk, inspect
+    import matplotlib
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+    import tkinter as tk
+    from tkinter import ttk
+    import inspect
 
 def is_integer(s):
     """can the string `s` be converted to int?""" 
@@ -33,14 +67,469 @@ def smooth_array(arr, window_size=3, mode='postpad'):
     
     if mode == 'prepad':
         arr = np.pad(arr, (padding_size, padding_size - 1 + window_size % 2), mode='edge')
-    arr = np.convolve(arr, np.ones(window_size) / window_size, mode='valid')
+    kernel = np.full(window_size, 1 / window_size, dtype=np.result_type(arr, np.float32)) # keeps float32 input float32
+    arr = np.convolve(arr, kernel, mode='valid')
     if mode == 'postpad':
         arr = np.pad(arr, (padding_size, padding_size - 1 + window_size % 2), mode='edge')
     return arr
 
-def convert_to_framings(data):
-    cum_data = np.cumsum(data)
-    return [np.sum(np.logical_and(cum_data < i + 1, cum_data >= i )) for i in range(int(math.ceil(cum_data[-1])))]
+# FrameStatistics property names: keys of frame_statistics (and TimingsSketch.frame_statistics), in this order
+FRAME_STATISTICS = ['TotalFrames', 'TotalDuration', 'AverageFPS', 'AverageFrameTime', 'FrameDurationStd', 'OneLowTime',
+                    'PointOneLowTime', 'LongestFrameTime']
+
+def frame_statistics(timings):
+    """Same metrics as FrameStatistics class on the Constellation side (except that all times are in ms).
+    Returns a dict with FrameStatistics property names (FRAME_STATISTICS) as keys, or None if there are no timings"""
+    frame_count = len(timings)
+    if frame_count == 0: return None
+
+    total_duration = np.sum(timings, dtype=np.float64)
+    average_frame_time = total_duration / frame_count
+    # FrameStatistics sorts timings in descending order and takes values at count / 100 and count / 1000
+    one_low_index, point_one_low_index = frame_count - 1 - frame_count // 100, frame_count - 1 - frame_count // 1000
+    partitioned = np.partition(timings, [one_low_index, point_one_low_index, frame_count - 1])
+
+    return {
+        'TotalFrames': frame_count,
+        'TotalDuration': float(total_duration),
+        'AverageFPS': float(1000 / average_frame_time),
+        'AverageFrameTime': float(average_frame_time),
+        'FrameDurationStd': float(np.std(timings, dtype=np.float64)),
+        'OneLowTime': float(partitioned[one_low_index]),
+        'PointOneLowTime': float(partitioned[point_one_low_index]),
+        'LongestFrameTime': float(partitioned[-1]),
+    }
+
+class TimingsSketch:
+    """Mergeable summary of frame timings: exact frame count, mean, variance, minimum and maximum, plus a histogram
+    with logarithmic buckets (bucket i holds values in [ratio^i, ratio^(i + 1)) ms), which gives any quantile with
+    relative error below (bucket_ratio - 1) / 2 (0.5%) without looking at the timings. Sketches of several reports
+    are combined with `merge`, so statistics of any group of reports only need their (cached) sketches
+    """
+    bucket_ratio = 1.01
+    min_timing = 1e-6 # smaller (and non-positive) timings are counted in the bucket of this value
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, minimum=math.inf, maximum=-math.inf, first_bucket=0, counts=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2 # sum of squared deviations from the mean
+        self.minimum = minimum
+        self.maximum = maximum
+        self.first_bucket = first_bucket # bucket index of counts[0]
+        self.counts = counts if counts is not None else np.zeros(0, dtype=np.int64)
+
+    @property
+    def std(self): return math.sqrt(self.m2 / self.count) if self.count > 0 else 0.0
+
+    @staticmethod
+    def bucket_indices(timings):
+        return np.floor(np.log(np.maximum(timings, TimingsSketch.min_timing), dtype=np.float64)
+                        / math.log(TimingsSketch.bucket_ratio)).astype(np.int64)
+
+    @staticmethod
+    def from_timings(timings):
+        if len(timings) == 0: return TimingsSketch()
+        indices = TimingsSketch.bucket_indices(timings)
+        first_bucket = int(np.min(indices))
+        mean = float(np.mean(timings, dtype=np.float64))
+
+        return TimingsSketch(len(timings), mean, float(np.var(timings, dtype=np.float64)) * len(timings),
+                             float(np.min(timings)), float(np.max(timings)), first_bucket,
+                             np.bincount(indices - first_bucket))
+
+    @staticmethod
+    def merge(sketches):
+        sketches = [x for x in sketches if x.count > 0]
+        if len(sketches) == 0: return TimingsSketch()
+        if len(sketches) == 1: return sketches[0]
+
+        first_bucket = min(x.first_bucket for x in sketches)
+        counts = np.zeros(max(x.first_bucket + len(x.counts) for x in sketches) - first_bucket, dtype=np.int64)
+        for x in sketches:
+            counts[x.first_bucket - first_bucket:x.first_bucket - first_bucket + len(x.counts)] += x.counts
+
+        # pooled mean and sum of squared deviations (Chan et al.)
+        count = sum(x.count for x in sketches)
+        mean = sum(x.mean * x.count for x in sketches) / count
+        m2 = sum(x.m2 + x.count * (x.mean - mean) ** 2 for x in sketches)
+        return TimingsSketch(count, mean, m2, min(x.minimum for x in sketches), max(x.maximum for x in sketches),
+                             first_bucket, counts)
+
+    def values_at_ranks(self, ranks):
+        "Estimates of values with given (0-based) `ranks` in the sorted timings. The lowest and highest are exact"
+        ranks = np.asarray(ranks)
+        buckets = np.searchsorted(np.cumsum(self.counts), ranks, side='right') + self.first_bucket
+        values = np.clip(self.bucket_ratio ** (buckets + 0.5), self.minimum, self.maximum)
+        values = np.where(ranks <= 0, self.minimum, values)
+        return np.where(ranks >= self.count - 1, self.maximum, values)
+
+    def quantiles(self, q):
+        return self.values_at_ranks(np.floor(np.asarray(q) * (self.count - 1)).astype(np.int64))
+
+    def frame_statistics(self):
+        "Same as frame_statistics of the timings, except that 1% and 0.1% low times are estimates"
+        if self.count == 0: return None
+        one_low_time, point_one_low_time = self.values_at_ranks(
+            [self.count - 1 - self.count // 100, self.count - 1 - self.count // 1000])
+
+        return {
+            'TotalFrames': self.count,
+            'TotalDuration': self.mean * self.count,
+            'AverageFPS': 1000 / self.mean,
+            'AverageFrameTime': self.mean,
+            'FrameDurationStd': self.std,
+            'OneLowTime': float(one_low_time),
+            'PointOneLowTime': float(point_one_low_time),
+            'LongestFrameTime': self.maximum,
+        }
+
+    def to_dict(self):
+        "json-compatible representation, see `from_dict`"
+        if self.count == 0: return { 'count': 0 }
+        return { 'count': self.count, 'mean': self.mean, 'm2': self.m2, 'min': self.minimum, 'max': self.maximum,
+                 'first_bucket': self.first_bucket, 'counts': self.counts.tolist() }
+
+    @staticmethod
+    def from_dict(data):
+        if data['count'] == 0: return TimingsSketch()
+        return TimingsSketch(data['count'], data['mean'], data['m2'], data['min'], data['max'], data['first_bucket'],
+                             np.array(data['counts'], dtype=np.int64))
+
+def kernel_density(samples, grid_range, grid_size=1000, log_grid=False):
+    """Gaussian kernel density estimate of `samples` on a regular grid of `grid_size` points spanning `grid_range`.
+    Bandwidth is chosen with Scott's rule, same as scipy's gaussian_kde. Instead of evaluating every sample at every
+    grid point, samples are linearly binned onto the grid and the bins are convolved with the kernel through FFT,
+    which makes the cost O(N + G log G) instead of O(N * G).
+    With log_grid=True the estimate is done in log space (on a log-spaced grid), which resolves long tails of frame
+    time distributions much better. `grid_range` must be positive in that case. Returns (x_axis, density)
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    if log_grid:
+        x_axis, density = kernel_density(np.log(samples[samples > 0]), np.log(grid_range), grid_size)
+        x_axis = np.exp(x_axis)
+        return x_axis, density / x_axis # change of variables back to linear space
+
+    x_axis = np.linspace(*grid_range, grid_size)
+    step = x_axis[1] - x_axis[0]
+    bandwidth = np.std(samples, ddof=1) * len(samples) ** (-1 / 5) if len(samples) > 1 else 0
+    if not bandwidth > 0 or not step > 0: # degenerate data, all samples are at the same point
+        counts = np.bincount(np.clip(np.round((samples - x_axis[0]) / step), 0, grid_size - 1).astype(np.int64),
+                             minlength=grid_size) if step > 0 else np.zeros(grid_size)
+        return x_axis, counts / max(len(samples) * step, 1e-12)
+
+    # extend the grid by the kernel radius on both sides, so that samples outside of `grid_range` are accounted for
+    radius = int(math.ceil(5 * bandwidth / step))
+    extended_size = grid_size + 2 * radius
+    positions = (samples - x_axis[0]) / step + radius
+    positions = positions[(positions >= 0) & (positions <= extended_size - 1)]
+    left = np.minimum(np.floor(positions).astype(np.int64), extended_size - 2)
+    weights = positions - left
+    counts = np.bincount(left, 1 - weights, minlength=extended_size) + np.bincount(left + 1, weights, minlength=extended_size)
+
+    kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) * step / bandwidth) ** 2) / (math.sqrt(2 * math.pi) * bandwidth)
+    fft_size = 1 << (extended_size + 2 * radius).bit_length()
+    convolved = np.fft.irfft(np.fft.rfft(counts, fft_size) * np.fft.rfft(kernel, fft_size), fft_size)
+    # grid point i is at index i + radius of the extended grid, kernel center adds another `radius`
+    density = convolved[2 * radius:2 * radius + grid_size] / len(samples)
+
+    return x_axis, np.maximum(density, 0)
+
+def decimate_minmax(x, y, max_points):
+    """Reduces a line to about `max_points` points while keeping its visual envelope: the x range is split into
+    max_points / 2 equal columns, and only the minimum and the maximum of each column are kept (in their original
+    order), so spikes never disappear. `x` must be sorted. Returns (x, y) - the input itself if it's small enough"""
+    x, y = np.asarray(x), np.asarray(y)
+    if len(x) <= max_points: return x, y
+
+    edges = np.linspace(x[0], x[-1], max(max_points // 2, 1) + 1)
+    starts = np.unique(np.searchsorted(x, edges[:-1])) # empty columns are dropped
+    mins, maxs = np.minimum.reduceat(y, starts), np.maximum.reduceat(y, starts)
+    column = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(y))))
+    # first position of the min / max within each column
+    min_positions, max_positions = np.flatnonzero(y == mins[column]), np.flatnonzero(y == maxs[column])
+    min_positions = min_positions[np.searchsorted(min_positions, starts)]
+    max_positions = max_positions[np.searchsorted(max_positions, starts)]
+
+    indices = np.concatenate(([0], np.column_stack((np.minimum(min_positions, max_positions),
+                                                    np.maximum(min_positions, max_positions))).ravel(), [len(x) - 1]))
+    return x[indices], y[indices]
+
+def compute_timings_density(timings, log_density=False):
+    "Density of frame timings for distribution plots. Returns (x_axis, density, mean, std)"
+    mean, std = np.mean(timings), np.std(timings)
+    rng = np.ptp(timings)
+    actual_range = (np.min(timings) - rng * 0.01, np.max(timings) + rng * 0.01)
+    visible_deviations = 3.3
+    visible_range = (mean - visible_deviations * std, mean + visible_deviations * std)
+    effective_range = (max(visible_range[0], actual_range[0]), min(visible_range[1], actual_range[1]))
+    if log_density: # the point of log scale is to see the tails, so show the whole range
+        effective_range = (np.min(timings) / 1.01, np.max(timings) * 1.01)
+
+    x_axis, density = kernel_density(timings, effective_range, 1000, log_grid=log_density)
+
+    return x_axis, density, mean, std
+
+def steady_state_starts(timings, separators, block_size=64, max_warmup=0.5, min_shift=0.02, penalty=4.0, max_steps=10):
+    """Finds where the steady state starts in each run of `timings` (concatenated runs ending at `separators`): shader
+    compilation, JIT and such often go on after the report's WarmupDuration. Runs are split into blocks of
+    `block_size` frames, and binary segmentation on log medians of the blocks finds points where the median changes.
+    A change counts only if the median shifts by more than `min_shift` (relative). It must also be significant: the
+    split has to reduce squared error by more than `penalty` * noise variance * log(number of blocks). The steady
+    state starts at the last such point in the first `max_warmup` of the run, later ones are left alone. All runs are
+    processed at once. Returns index of the first steady frame in each run (0 if no warmup was found)"""
+    starts = np.concatenate(([0], separators[:-1]))
+    block_counts = (separators - starts) // block_size
+    cuts = np.zeros(len(separators), dtype=np.int64)
+    runs = np.flatnonzero(block_counts >= 4)
+    if len(runs) == 0: return cuts
+
+    counts = block_counts[runs]
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1])) # first block of each run
+    block_runs = np.repeat(np.arange(len(runs)), counts)
+    first_frames = starts[runs][block_runs] + (np.arange(len(block_runs)) - offsets[block_runs]) * block_size
+    blocks = timings[first_frames[:, None] + np.arange(block_size)]
+    medians = np.log(np.maximum(np.median(blocks, axis=1), 1e-6)).astype(np.float64)
+
+    # noise of block medians, from the median step between neighbouring blocks (not affected by warmup much)
+    steps = np.abs(np.diff(medians))[block_runs[1:] == block_runs[:-1]]
+    steps = steps[np.lexsort((steps, np.repeat(np.arange(len(runs)), counts - 1)))]
+    noise = np.maximum(steps[offsets - np.arange(len(runs)) + (counts - 1) // 2] / math.sqrt(2) * 1.4826, 1e-3)
+    threshold = penalty * noise ** 2 * np.log(counts)
+
+    # binary segmentation of all runs at once: each step splits every segment where it is worth it
+    prefix = np.concatenate(([0], np.cumsum(medians)))
+    is_start = np.zeros(len(medians), dtype=bool)
+    is_start[offsets] = True
+    splits = np.arange(len(medians)) # split before block i: [begin, i) and [i, end)
+    for _ in range(max_steps):
+        segment_starts = np.flatnonzero(is_start)
+        segments = np.cumsum(is_start) - 1
+        begin, end = segment_starts[segments], np.append(segment_starts[1:], len(medians))[segments]
+        left, right = splits - begin, end - splits
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shift = (prefix[splits] - prefix[begin]) / left - (prefix[end] - prefix[splits]) / right
+            gain = np.where(left > 0, left * right / (left + right) * shift ** 2, -1)
+
+        best = np.maximum.reduceat(gain, segment_starts)
+        hits = np.flatnonzero(gain == best[segments])
+        best_splits = hits[np.unique(segments[hits], return_index=True)[1]]
+        accept = (best > threshold[block_runs[segment_starts]]) & (np.abs(shift[best_splits]) > math.log1p(min_shift))
+        if not accept.any(): break
+        is_start[best_splits[accept]] = True
+
+    # steady state starts at the last change within the first `max_warmup` of the run
+    last_split = offsets + np.maximum((counts * max_warmup).astype(np.int64), 1)
+    changes = np.flatnonzero(is_start & (splits <= last_split[block_runs]))
+    begin = offsets.copy()
+    np.maximum.at(begin, block_runs[changes], changes)
+    cuts[runs] = (begin - offsets) * block_size
+    return cuts
+
+def merge_group_timings(reports, exclude_outliers=False, exclusion_threshold=None, trim_warmup=False):
+    """Concatenates timings of `reports` (a group on a composite plot), excluding reports with outlying average frame
+    time if requested. With `trim_warmup`, frames before the steady state (see steady_state_starts) are dropped
+    first. Returns (timings, separators, TimingsSketch of the timings) or None if no report has any frames"""
+    load_report_timings(reports)
+    reports = [(x.timings, x.sketch) for x in reports]
+    reports = [x for x in reports if len(x[0]) > 0]
+    if len(reports) == 0: return None
+
+    if trim_warmup:
+        with profiler.stage('trim warmup'):
+            timings = [x for x, _ in reports]
+            cuts = steady_state_starts(concatenate_timings(timings), np.cumsum([len(x) for x in timings]))
+            reports = [(x[cut:], TimingsSketch.from_timings(x[cut:])) if cut > 0 else (x, sketch)
+                       for (x, sketch), cut in zip(reports, cuts)]
+
+    if exclude_outliers and len(reports) > 1: # mean and std of all frames come from the sketches, no need to concatenate
+        with profiler.stage('exclude outliers'):
+            group_sketch = TimingsSketch.merge([x for _, x in reports])
+            baseline, std = group_sketch.mean, group_sketch.std
+            means = np.array([x.mean for _, x in reports])
+            while True: # in case we try to exclude too much, increase threshold
+                exclude = np.abs(means - baseline) > std * exclusion_threshold
+                if np.sum(exclude) < len(reports) // 2: break
+                exclusion_threshold *= 1.1
+
+            reports = [x for i, x in enumerate(reports) if not exclude[i]]
+
+    timings, sketches = [x for x, _ in reports], [x for _, x in reports]
+    return concatenate_timings(timings), np.cumsum([len(x) for x in timings]), TimingsSketch.merge(sketches)
+
+def transform_timings(timings, time_axis, sort_timings, plot_fps):
+    "Prepares merged timings for line plots. Returns (x_axis, timings)"
+    x_axis = np.arange(len(timings), dtype=np.float32)
+    use_time_axis = time_axis and not sort_timings
+    if use_time_axis: # accumulated in float64, float32 sum drifts on long runs
+        x_axis = (np.cumsum(timings, dtype=np.float64) / 1000).astype(np.float32)
+    if sort_timings: # so that all plots in a group share x axis :)
+        x_axis = np.linspace(0, 1, len(timings), dtype=np.float32)
+    
+    if sort_timings:
+        timings = np.sort(timings)
+    if plot_fps:
+        timings = 1000 / timings
+
+    return x_axis, timings
+
+def fps_over_time(timings, separators, interval=1.0):
+    """FPS in consecutive intervals of `interval` seconds since the start of each run, averaged over runs. `timings`
+    and `separators` are merged timings of a group and ends of its runs, as returned by merge_group_timings.
+    A frame counts towards the interval it ends in, and a run only contributes to intervals it covers completely.
+    Returns (x_axis, fps): interval centers (s) and FPS, both empty if no run is longer than `interval`"""
+    ends = np.cumsum(timings, dtype=np.float64) / 1000 # frame end times since the start of the first run
+    run_lengths = np.diff(separators, prepend=0)
+    run_starts = np.concatenate(([0], ends[separators[:-1] - 1]))
+    full_intervals = np.floor((ends[separators - 1] - run_starts) / interval).astype(np.int64)
+
+    intervals = np.floor((ends - np.repeat(run_starts, run_lengths)) / interval).astype(np.int64)
+    intervals = intervals[intervals < np.repeat(full_intervals, run_lengths)]
+    interval_count = int(np.max(full_intervals))
+    frame_counts = np.bincount(intervals, minlength=interval_count)
+    # number of runs that cover each interval
+    run_counts = len(full_intervals) - np.searchsorted(np.sort(full_intervals), np.arange(interval_count), side='right')
+
+    x_axis = (np.arange(interval_count) + 0.5) * interval
+    return x_axis, frame_counts / (run_counts * interval)
+
+def align_runs(timings, separators, interval=0.1, plot_fps=False):
+    """Puts runs of a group (merged `timings` and ends of runs `separators`, as returned by merge_group_timings) on a
+    shared time grid with a step of `interval` seconds, instead of one after another. Each run gets its average frame
+    time (or FPS) in every grid interval it covers completely, from the number of frames it completed by the start
+    and the end of the interval, interpolated over cumulative timings. Returns (x_axis, mean, low, high, run_counts):
+    interval centers (s), mean, 5th and 95th percentiles over runs and the number of runs covering each interval"""
+    ends = np.cumsum(timings, dtype=np.float64) / 1000 # frame end times since the start of the first run
+    run_count, starts = len(separators), np.concatenate(([0], separators[:-1]))
+    run_starts = np.concatenate(([0], ends[separators[:-1] - 1]))
+    durations = ends[separators - 1] - run_starts
+    interval_count = int(np.max(durations) / interval)
+
+    # runs are moved `span` seconds apart, so that all of them are interpolated with one np.interp call
+    span = np.max(durations) + interval
+    offsets = np.arange(run_count) * span
+    keys = np.insert(ends + np.repeat(offsets - run_starts, separators - starts), starts, offsets)
+    frames = np.insert(np.arange(1, len(timings) + 1, dtype=np.float64), starts, starts)
+    grid = np.arange(interval_count + 1) * interval
+    completed = np.interp(offsets[:, None] + grid, keys, frames) # (runs, grid points)
+
+    frame_counts = np.diff(completed, axis=1)
+    covered = grid[1:] <= durations[:, None]
+    with np.errstate(divide='ignore'):
+        values = frame_counts / interval if plot_fps else interval * 1000 / frame_counts
+    values = np.where(covered, values, np.nan)
+
+    x_axis = (np.arange(interval_count) + 0.5) * interval
+    if interval_count == 0: return x_axis, *np.zeros((3, 0)), np.zeros(0, dtype=np.int64)
+    low, high = np.nanpercentile(values, [5, 95], axis=0)
+    return x_axis, np.nanmean(values, axis=0), low, high, np.count_nonzero(covered, axis=0)
+
+def rolling_median(timings, separators, window=31):
+    "Median of `window` (odd) frames around each frame, within its run (runs of `timings` end at `separators`)"
+    window = min(window, len(timings) - 1 + len(timings) % 2)
+    half, medians = window // 2, np.empty_like(timings)
+    if len(timings) == 0: return medians
+    windows = sliding_window_view(timings, window)
+    for start in range(0, len(windows), 1 << 16): # in chunks, since partition copies
+        chunk = windows[start:start + (1 << 16)]
+        medians[start + half:start + half + len(chunk)] = np.partition(chunk, half, axis=1)[:, half]
+
+    # near the ends of runs, windows are clipped to their own run
+    starts = np.concatenate(([0], separators[:-1]))
+    edges = np.unique(np.concatenate([np.r_[x:min(x + half, y), max(y - half, x):y] for x, y in zip(starts, separators)]))
+    if len(edges) > 0:
+        run = np.searchsorted(separators, edges, side='right')
+        indices = np.clip(edges[:, None] + np.arange(-half, half + 1), starts[run][:, None], separators[run][:, None] - 1)
+        medians[edges] = np.median(timings[indices], axis=1)
+    return medians
+
+def hitch_analysis(timings, separators, threshold=2.0, min_excess=1.0, window=31, max_gap=2, resolution=0.05):
+    """Finds hitches in runs of a group (merged `timings` and ends of runs `separators`, as returned by
+    merge_group_timings). A frame is a hitch frame if it takes `threshold` times longer than the rolling median of
+    `window` frames around it, and at least `min_excess` ms longer. Hitch frames at most `max_gap` frames apart are
+    one hitch (event), and the time it lost is how much its frames took over the median.
+
+    Periodic stalls show up in the autocorrelation of time lost to hitches, binned into `resolution` seconds since the
+    start of each run (computed with FFT, all runs at once): its first major peak after the first zero crossing gives
+    Period (s) and PeriodStrength (correlation around that lag, 0..1; below 0.2 or so it is hardly periodic).
+    Returns (statistics, events): a dict of group statistics (times in ms, intervals and period in s) and a dict of
+    arrays with Run, Start (s since the start of the run), HitchFrames, TimeLost (ms) and Peak (ms) of each hitch"""
+    timings = np.asarray(timings)
+    starts = np.concatenate(([0], separators[:-1]))
+    ends = np.cumsum(timings, dtype=np.float64) / 1000
+    run_start_times = np.concatenate(([0], ends[separators[:-1] - 1]))
+    durations = ends[separators - 1] - run_start_times
+
+    medians = rolling_median(timings, separators, window)
+    excess = timings.astype(np.float64) - medians
+    hitch_frames = np.flatnonzero((timings > medians * threshold) & (excess >= min_excess))
+    runs = np.searchsorted(separators, hitch_frames, side='right')
+    new_event = np.ones(len(hitch_frames), dtype=bool)
+    new_event[1:] = (np.diff(hitch_frames) > max_gap + 1) | (np.diff(runs) != 0)
+    event_starts = np.flatnonzero(new_event)
+    first_frames = hitch_frames[event_starts]
+    events = {
+        'Run': runs[event_starts],
+        'Start': ends[first_frames] - timings[first_frames] / 1000 - run_start_times[runs[event_starts]],
+        'HitchFrames': np.diff(np.append(event_starts, len(hitch_frames))),
+        'TimeLost': np.add.reduceat(excess[hitch_frames], event_starts) if len(event_starts) > 0 else np.zeros(0),
+        'Peak': np.maximum.reduceat(timings[hitch_frames], event_starts) if len(event_starts) > 0 else np.zeros(0),
+    }
+
+    same_run = np.diff(events['Run']) == 0
+    intervals = np.diff(events['Start'])[same_run]
+    total_duration, time_lost = float(np.sum(durations)), float(np.sum(excess[hitch_frames]))
+    statistics = {
+        'Runs': len(separators),
+        'Frames': len(timings),
+        'Duration': total_duration,
+        'HitchFrames': len(hitch_frames),
+        'Hitches': len(event_starts),
+        'HitchesPerMinute': len(event_starts) / total_duration * 60 if total_duration > 0 else 0.0,
+        'TimeLost': time_lost,
+        'TimeLostPercent': time_lost / (total_duration * 1000) * 100 if total_duration > 0 else 0.0,
+        'MeanPeak': float(np.mean(events['Peak'])) if len(event_starts) > 0 else math.nan,
+        'IntervalMean': float(np.mean(intervals)) if len(intervals) > 0 else math.nan,
+        'IntervalMedian': float(np.median(intervals)) if len(intervals) > 0 else math.nan,
+        'IntervalStd': float(np.std(intervals)) if len(intervals) > 0 else math.nan,
+        'IntervalMin': float(np.min(intervals)) if len(intervals) > 0 else math.nan,
+        'Period': math.nan,
+        'PeriodStrength': 0.0,
+    }
+
+    # autocorrelation of time lost per bin, summed over runs. Zero padding to twice the length avoids wrapping around
+    bin_counts = np.ceil(durations / resolution).astype(np.int64)
+    max_bins = int(np.max(bin_counts))
+    if len(hitch_frames) < 3 or max_bins < 8: return statistics, events
+    bins = ((ends[hitch_frames] - run_start_times[runs]) / resolution).astype(np.int64)
+    signal = np.bincount(runs * max_bins + np.minimum(bins, max_bins - 1), excess[hitch_frames],
+                         minlength=len(separators) * max_bins).reshape(len(separators), max_bins)
+    valid = np.arange(max_bins) < bin_counts[:, None]
+    signal -= np.where(valid, (signal.sum(axis=1) / np.maximum(bin_counts, 1))[:, None], 0)
+    spectrum = np.fft.rfft(signal, n=1 << int(2 * max_bins - 1).bit_length(), axis=1)
+    correlation = np.fft.irfft(np.sum(np.abs(spectrum) ** 2, axis=0))[:max_bins // 2]
+    if correlation[0] <= 0: return statistics, events
+    correlation /= correlation[0]
+    first_zero = np.argmax(correlation <= 0)
+    if first_zero == 0: return statistics, events
+
+    # jitter spreads peaks over neighbouring bins, so they are compared by sums of 3 bins. Multiples of the period
+    # correlate about as well as the period itself, so the first peak close to the best one is taken
+    correlation = np.where(np.arange(len(correlation)) < first_zero, 0, np.maximum(correlation, 0))
+    peaks = np.convolve(correlation, np.ones(3), mode='same')[:-1]
+    peak = first_zero + int(np.argmax(peaks[first_zero:] >= 0.8 * np.max(peaks[first_zero:])))
+    while peak + 1 < len(peaks) and peaks[peak + 1] > peaks[peak]: peak += 1
+    weights = correlation[peak - 1:peak + 2]
+    if np.sum(weights) <= 0: return statistics, events
+    statistics['Period'] = float(peak + (weights[-1] - weights[0]) / np.sum(weights)) * resolution
+    statistics['PeriodStrength'] = float(min(np.sum(weights), 1))
+    return statistics, events
+
+def list_report_directory(directory: Path):
+    """Returns (subdirectories, json files) of `directory` in a report tree. ReportCache directories are skipped: they
+    are written next to the reports and hold json files that are not reports"""
+    items = list(directory.iterdir())
+    return ([x for x in items if x.is_dir() and x.name != REPORT_CACHE_DIRNAME],
+            [x for x in items if x.is_file() and x.suffix == '.json'])
 
 def is_child(child_path, parent_path):
     try:
@@ -52,6 +541,547 @@ def is_child(child_path, parent_path):
 def snake_case_to_readable(snake_case):
     return ' '.join(x.capitalize() for x in snake_case.split('_'))
 
+class DecimatedLines:
+    """Plots lines decimated with decimate_minmax to about 2 points per horizontal pixel of the axes. Whenever x limits
+    of the axes change (zoom, pan), visible part of each line is decimated again from the full data"""
+
+    def __init__(self):
+        self.lines = {} # { axes: [(line, x, y), ...] }
+
+    def _max_points(self, ax):
+        return 2 * max(int(ax.bbox.width), 100)
+
+    def plot(self, ax, x, y, **kwargs):
+        x, y = np.asarray(x), np.asarray(y)
+        line = ax.plot(*decimate_minmax(x, y, self._max_points(ax)), **kwargs)[0]
+        if ax not in self.lines:
+            self.lines[ax] = []
+            ax.callbacks.connect('xlim_changed', self._on_xlim_changed)
+
+        self.lines[ax].append((line, x, y))
+        return line
+
+    def set_data(self, line, x, y):
+        "Replaces data of a line created with `plot`"
+        x, y = np.asarray(x), np.asarray(y)
+        entries = self.lines[line.axes]
+        for i, (other, _, _) in enumerate(entries):
+            if other is line: entries[i] = (line, x, y)
+        self._decimate_visible(line, x, y)
+
+    def _decimate_visible(self, line, x, y):
+        x_min, x_max = line.axes.get_xlim()
+        # keep one point outside of the view on both sides, so that the line reaches the edges
+        start, end = max(np.searchsorted(x, x_min) - 1, 0), np.searchsorted(x, x_max) + 1
+        line.set_data(*decimate_minmax(x[start:end], y[start:end], self._max_points(line.axes)))
+
+    def _on_xlim_changed(self, ax):
+        for line, x, y in self.lines.get(ax, []):
+            self._decimate_visible(line, x, y)
+
+    def forget(self, ax):
+        "Call when axes are cleared"
+        self.lines.pop(ax, None)
+
+    def clear(self):
+        self.lines = {}
+
+class CompositePlotter:
+    """Draws data made by ReportAnalyzer.prepare_composite_data on a persistent figure, which can be on any canvas
+    (Tk, Agg, ...). The subplot grid is only rebuilt when the number of plots changes, and subplots that show the same
+    groups with the same kind of artists as before are updated in place. If no axes limits changed after that, only
+    the data artists are redrawn over a cached background of the figure (blitting) instead of drawing everything
+    """
+
+    def __init__(self, figure, decimated_lines=None):
+        self.figure = figure
+        self.figure.set_layout_engine('tight')
+        self.decimated_lines = decimated_lines if decimated_lines is not None else DecimatedLines()
+        self.axes = []
+        self.layouts = [] # for each axes: None or (layout key, [{ artist name: artist }, ...] for each group)
+        self.plot_count = None
+        self.background = None
+        self.capturing_background = False
+        self.connected_canvas = None
+
+    def set_plot_count(self, count):
+        "Rebuilds subplot grid if the number of plots changed. Returns True if it did"
+        if count == self.plot_count: return False
+        n = m = math.ceil(math.sqrt(max(count, 1)))
+        if n * (n - 1) >= count: m -= 1
+
+        self.figure.clear()
+        self.decimated_lines.clear()
+        self.axes = list(self.figure.subplots(n, m, squeeze=False).ravel())
+        self.layouts = [None] * len(self.axes)
+        self.plot_count = count
+        return True
+
+    def draw(self, data, options):
+        """data - { plot_name: { group_value: group_data } }, options - ReportAnalyzer variables that affect plots
+        (plot_distribution, log_density, fps_over_time, align_runs, sort_timings, hide_raw, time_axis, plot_fps,
+        show_separators, detect_steady_state). Returns True if the subplot grid was rebuilt"""
+        canvas = self.figure.canvas
+        if canvas is not self.connected_canvas: # cached background is invalid after any draw, except our own
+            canvas.mpl_connect('draw_event', self._on_draw)
+            self.connected_canvas = canvas
+
+        rebuilt = self.set_plot_count(len(data))
+        can_blit = not rebuilt
+        for i, (title, plot_data) in enumerate(data.items()):
+            ax, key = self.axes[i], self.layout_key(plot_data, options)
+            if self.layouts[i] is None or self.layouts[i][0] != key or ax.get_title() != title:
+                self.decimated_lines.forget(ax)
+                ax.cla()
+                ax.set_title(title)
+                build = { 'density': self.build_density, 'fps': self.build_fps, 'aligned': self.build_aligned,
+                          'lines': self.build_lines }[key[0]]
+                self.layouts[i] = (key, build(ax, plot_data, options))
+                can_blit = False
+                continue
+
+            limits = ax.get_xlim(), ax.get_ylim()
+            update = { 'density': self.update_density, 'fps': self.update_fps, 'aligned': self.update_aligned,
+                       'lines': self.update_lines }[key[0]]
+            update(ax, plot_data, self.layouts[i][1], options)
+            if (ax.get_xlim(), ax.get_ylim()) != limits: can_blit = False
+
+        if can_blit and getattr(canvas, 'supports_blit', False) and hasattr(canvas, 'copy_from_bbox'):
+            with profiler.stage('blit'): self.blit()
+        else:
+            with profiler.stage('render'): canvas.draw()
+
+        return rebuilt
+
+    def layout_key(self, data, options):
+        "Subplots with the same layout key have the same artists, so one can be updated to show the other"
+        if options['plot_distribution']: return ('density', tuple(data), options['log_density'])
+        if options['fps_over_time']: return ('fps', tuple(data))
+        if options['align_runs']: return ('aligned', tuple(data), options['plot_fps'])
+        sort_timings = options['sort_timings']
+        show_separators = options['show_separators'] and not sort_timings
+        return ('lines', tuple(data), sort_timings, options['hide_raw'] and not sort_timings, options['time_axis'],
+                options['plot_fps'], tuple(len(x[3]) for x in data.values()) if show_separators else None,
+                options['detect_steady_state'] and not sort_timings)
+
+    def _on_draw(self, event):
+        if not self.capturing_background: self.background = None
+
+    def data_artists(self):
+        artists = []
+        for layout in self.layouts:
+            if layout is None: continue
+            for group in layout[1]:
+                for artist in group.values():
+                    if isinstance(artist, list): artists += artist
+                    elif artist is not None: artists.append(artist)
+
+        return artists
+
+    def blit_artists(self):
+        "Data artists and artists drawn on top of them (legends, spines), in the order a full draw would draw them"
+        data_artists = set(self.data_artists())
+        artists = []
+        for ax in self.axes:
+            on_top = [x for x in [ax.get_legend(), *ax.spines.values()] if x is not None]
+            children = [x for x in ax.get_children() if x in data_artists or x in on_top]
+            artists += sorted(children, key=lambda x: x.zorder) # same as Axes.draw
+
+        return artists
+
+    def blit(self):
+        canvas = self.figure.canvas
+        artists = self.blit_artists()
+        if self.background is None: # draw everything except the data artists once
+            for artist in artists: artist.set_visible(False)
+            self.capturing_background = True
+            try:
+                canvas.draw()
+                self.background = canvas.copy_from_bbox(self.figure.bbox)
+            finally:
+                self.capturing_background = False
+                for artist in artists: artist.set_visible(True)
+
+        canvas.restore_region(self.background)
+        for artist in artists:
+            artist.axes.draw_artist(artist)
+        canvas.blit(self.figure.bbox)
+
+    def build_lines(self, ax, data, options):
+        "data : dict of { plot_name: (x_values, timings, smoothed_timings, separators, sketch, steady_starts) }"
+        sort_timings = options['sort_timings']
+        only_smoothed = options['hide_raw']
+        use_time_axis = options['time_axis'] and not sort_timings
+        show_separators = options['show_separators']
+        show_steady_starts = options['detect_steady_state'] and not sort_timings
+
+        groups = []
+        for plot_name, (x_axis, timings, smoothed, separators, _, steady_starts) in data.items():
+            artists, color = { 'raw': None, 'smoothed': None, 'separators': [], 'steady': None }, None
+
+            if not only_smoothed or sort_timings:
+                artists['raw'] = self.decimated_lines.plot(ax, x_axis, timings, label=plot_name,
+                                                           alpha=1 if sort_timings else 0.35, lw=1)
+                color = artists['raw'].get_color()
+
+            if not sort_timings:
+                artists['smoothed'] = self.decimated_lines.plot(ax, x_axis, smoothed, label=plot_name, color=color)
+                color = artists['smoothed'].get_color()
+            mean = np.mean(timings)
+            artists['mean'] = ax.axhline(mean, color=color, linestyle='--', lw=3, alpha=0.6)
+            artists['text'] = ax.text(0, mean, f'{mean:0.2f}')
+
+            if not sort_timings and show_separators:
+                for separator in separators[:-1]:
+                    if separator <= 0: continue # shouldn't really happen but who knows
+                    x = x_axis[separator - 1]
+                    artists['separators'].append(ax.axvline(x, color='k', lw=1, linestyle=':', alpha=0.5))
+
+            if show_steady_starts: # where warmup ends
+                artists['steady'] = ax.plot(x_axis[steady_starts], smoothed[steady_starts], linestyle='', marker='v',
+                                            markersize=9, color=color, markeredgecolor='k')[0]
+
+            groups.append(artists)
+
+        ax.set_ylim(*self.lines_y_limits(data, groups, options['plot_fps']))
+        x_label = 'Time (s)' if use_time_axis else 'Frame index'
+        if sort_timings: x_label = 'Frames'
+        ax.set_xlabel(x_label)
+        ax.set_ylabel('FPS' if options['plot_fps'] else 'Frame duration (ms)')
+        ax.legend(loc='upper left', fontsize='small')
+
+        return groups
+
+    def update_lines(self, ax, data, groups, options):
+        for artists, (x_axis, timings, smoothed, separators, _, steady_starts) in zip(groups, data.values()):
+            if artists['raw'] is not None: self.decimated_lines.set_data(artists['raw'], x_axis, timings)
+            if artists['smoothed'] is not None: self.decimated_lines.set_data(artists['smoothed'], x_axis, smoothed)
+            mean = np.mean(timings)
+            artists['mean'].set_ydata([mean, mean])
+            artists['text'].set_y(mean)
+            artists['text'].set_text(f'{mean:0.2f}')
+            separators = [x for x in separators[:-1] if x > 0]
+            for line, separator in zip(artists['separators'], separators):
+                line.set_xdata([x_axis[separator - 1]] * 2)
+            if artists['steady'] is not None: artists['steady'].set_data(x_axis[steady_starts], smoothed[steady_starts])
+
+        ax.relim()
+        ax.autoscale_view(scaley=False)
+        ax.set_ylim(*self.lines_y_limits(data, groups, options['plot_fps']))
+
+    def lines_y_limits(self, data, groups, plot_fps):
+        """y limits that leave out 0.1% of the most extreme plotted values on each side. Smoothed lines stay within
+        the range of raw timings, so when those are plotted, limits are estimated from timing sketches of the groups"""
+        if all(artists['raw'] is not None for artists in groups):
+            sketch = TimingsSketch.merge([x[4] for x in data.values()])
+            bottom, top = sketch.quantiles([0.001, 0.999])
+            if plot_fps: bottom, top = 1000 / top, 1000 / bottom
+            return bottom / 1.01, top * 1.01
+
+        total_data = []
+        for artists, (x_axis, timings, smoothed, *_) in zip(groups, data.values()):
+            if artists['raw'] is not None: total_data.append(timings)
+            if artists['smoothed'] is not None: total_data.append(smoothed)
+
+        total_data = np.concatenate(total_data)
+        top_index, bottom_index = int(len(total_data) * 0.999 - 0.999), int(len(total_data) * 0.001)
+        total_data = np.partition(total_data, [bottom_index, top_index]) # only these two need to be in sorted order
+        return total_data[bottom_index] / 1.01, total_data[top_index] * 1.01
+
+    def build_fps(self, ax, data, options):
+        "data : dict of { plot_name: (interval_centers, fps) }"
+        groups = []
+        for plot_name, (x_axis, fps) in data.items():
+            line = ax.plot(x_axis, fps, label=plot_name, drawstyle='steps-mid')[0]
+            mean = np.mean(fps)
+            groups.append({
+                'line': line,
+                'mean': ax.axhline(mean, color=line.get_color(), linestyle='--', lw=2, alpha=0.6),
+                'text': ax.text(0, mean, f'{mean:0.1f}'),
+            })
+
+        ax.set_xlabel('Time (s)')
+        ax.set_ylabel('FPS')
+        ax.legend(loc='upper left', fontsize='small')
+
+        return groups
+
+    def update_fps(self, ax, data, groups, options):
+        for artists, (x_axis, fps) in zip(groups, data.values()):
+            artists['line'].set_data(x_axis, fps)
+            mean = np.mean(fps)
+            artists['mean'].set_ydata([mean, mean])
+            artists['text'].set_y(mean)
+            artists['text'].set_text(f'{mean:0.1f}')
+
+        ax.relim()
+        ax.autoscale_view()
+
+    def build_aligned(self, ax, data, options):
+        "data : dict of { plot_name: (interval_centers, mean, low, high, run_counts) }"
+        groups = []
+        for plot_name, (x_axis, mean, low, high, run_counts) in data.items():
+            line = ax.plot(x_axis, mean, label=plot_name)[0]
+            color = line.get_color()
+            average = np.mean(mean)
+            groups.append({
+                'line': line,
+                'band': ax.fill_between(x_axis, low, high, color=color, alpha=0.2, lw=0),
+                'mean': ax.axhline(average, color=color, linestyle='--', lw=2, alpha=0.6),
+                'text': ax.text(0, average, f'{average:0.2f}'),
+            })
+
+        ax.set_xlabel('Time since the start of a run (s)')
+        ax.set_ylabel('FPS' if options['plot_fps'] else 'Frame duration (ms)')
+        ax.legend(loc='upper left', fontsize='small')
+
+        return groups
+
+    def update_aligned(self, ax, data, groups, options):
+        for artists, (x_axis, mean, low, high, run_counts) in zip(groups, data.values()):
+            color = artists['line'].get_color()
+            artists['line'].set_data(x_axis, mean)
+            if hasattr(artists['band'], 'set_data'):
+                artists['band'].set_data(x_axis, low, high)
+            else: # older matplotlib
+                artists['band'].remove()
+                artists['band'] = ax.fill_between(x_axis, low, high, color=color, alpha=0.2, lw=0)
+            average = np.mean(mean)
+            artists['mean'].set_ydata([average, average])
+            artists['text'].set_y(average)
+            artists['text'].set_text(f'{average:0.2f}')
+
+        ax.relim()
+        for x_axis, _, low, high, _ in data.values(): # relim ignores fills
+            ax.update_datalim(np.column_stack([x_axis, low]))
+            ax.update_datalim(np.column_stack([x_axis, high]))
+        ax.autoscale_view()
+
+    def density_text_positions(self, data):
+        "y positions of mean labels, so that they don't overlap"
+        if len(data) == 0: return []
+        max_density = np.max(next(iter(data.values()))[1])
+        return [max_density * 0.95 - max_density * 0.1 * i for i in range(len(data))]
+
+    def build_density(self, ax, data, options):
+        "data : dict of { plot_name: (x_values, y_values, time_mean, time_std) }"
+        groups = []
+        for (plot_name, (x_axis, density, mean, std)), text_y in zip(data.items(), self.density_text_positions(data)):
+            line = ax.plot(x_axis, density, label=plot_name)[0]
+            color = line.get_color()
+            groups.append({
+                'line': line,
+                'fill': ax.fill_between(x_axis, density, color=color, alpha=0.15),
+                'mean': ax.axvline(mean, color=color, linestyle='--', lw=2, alpha=0.8),
+                'span': ax.axvspan(mean - std, mean + std, color=color, alpha=0.2),
+                'text': ax.text(mean, text_y, f'{mean:0.2f}'),
+            })
+
+        if options['log_density']: ax.set_xscale('log')
+        ax.set_xlabel('Frame duration (ms)')
+        ax.set_ylabel('Frequency')
+        ax.legend(fontsize='small')
+
+        return groups
+
+    def update_density(self, ax, data, groups, options):
+        for artists, (x_axis, density, mean, std), text_y in zip(groups, data.values(), self.density_text_positions(data)):
+            color = artists['line'].get_color()
+            artists['line'].set_data(x_axis, density)
+            if hasattr(artists['fill'], 'set_data'):
+                artists['fill'].set_data(x_axis, density, 0)
+            else: # older matplotlib
+                artists['fill'].remove()
+                artists['fill'] = ax.fill_between(x_axis, density, color=color, alpha=0.15)
+            artists['mean'].set_xdata([mean, mean])
+            artists['span'].remove()
+            artists['span'] = ax.axvspan(mean - std, mean + std, color=color, alpha=0.2)
+            artists['text'].set_position((mean, text_y))
+            artists['text'].set_text(f'{mean:0.2f}')
+
+        ax.relim()
+        for x_axis, density, _, _ in data.values(): # relim ignores fills, which go down to 0
+            ax.update_datalim([(x_axis[0], 0)])
+        ax.autoscale_view()
+
+class StageProfiler:
+    """Measures time spent in stages of the analyzer: `with profiler.stage('merge'): ...`. Stages can be nested and
+    used from any thread. Total time and number of calls of each stage since the last `reset` are kept in `totals`
+    (a stage nested in itself is only counted once), and with keep_events=True every call is also recorded, so that
+    `write_trace` can save them as a Chrome trace (chrome://tracing, https://ui.perfetto.dev)
+    """
+
+    def __init__(self, keep_events=False):
+        self.keep_events = keep_events
+        self.totals = { } # { name: [seconds, calls, depth] }, depth - lowest nesting level the stage was seen at
+        self.events = [] # (name, thread id, thread name, start, duration)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.origin = perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        stack = self.local.__dict__.setdefault('stack', [])
+        stack.append(name)
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            duration = perf_counter() - start
+            stack.pop()
+            with self.lock:
+                total = self.totals.setdefault(name, [0.0, 0, len(stack)])
+                if name not in stack: total[0] += duration
+                total[1] += 1
+                total[2] = min(total[2], len(stack))
+                if self.keep_events:
+                    thread = threading.current_thread()
+                    self.events.append((name, thread.ident, thread.name, start, duration))
+
+    def reset(self):
+        "Starts a new measurement of `totals`. Recorded events are kept"
+        with self.lock:
+            self.totals = { }
+
+    def summary(self, max_depth=0):
+        "One line with total times of the stages up to `max_depth`, e.g. for a status bar"
+        with self.lock:
+            return ', '.join(f'{name} {seconds * 1000:.0f} ms' for name, (seconds, _, depth) in self.totals.items()
+                             if depth <= max_depth)
+
+    def report(self):
+        "Table of all stages, nested stages are indented. Times of stages that ran in several threads add up"
+        with self.lock:
+            lines = [f'{"  " * depth + name:<32} {seconds * 1000:>10.1f} ms {calls:>8} calls'
+                     for name, (seconds, calls, depth) in self.totals.items()]
+        return '\n'.join([f'{"Stage":<32} {"Time":>13} {"Calls":>14}'] + lines)
+
+    def write_trace(self, path):
+        with self.lock:
+            events = list(self.events)
+
+        threads = { thread_id: thread_name for _, thread_id, thread_name, _, _ in events }
+        trace = [{ 'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': thread_id, 'args': { 'name': name } }
+                 for thread_id, name in threads.items()]
+        trace += [{ 'name': name, 'cat': 'analyzer', 'ph': 'X', 'pid': os.getpid(), 'tid': thread_id,
+                    'ts': (start - self.origin) * 1e6, 'dur': duration * 1e6 }
+                  for name, thread_id, _, start, duration in events]
+
+        trace = json.dumps({ 'traceEvents': trace, 'displayTimeUnit': 'ms' }).encode()
+        write_file_atomic(path, lambda file: file.write(trace))
+
+# stages of loading, computing and drawing plots are measured with this, see `--profile`
+profiler = StageProfiler()
+
+class PipelineCache:
+    """Memoizes results of computation stages. Results are keyed by stage name and everything the stage depends on,
+    including keys of the stages it takes input from. When a run (begin_run / end_run) is over, results of each stage
+    that were not requested during that run are dropped, so only the results of the last run of every stage are kept
+    """
+
+    def __init__(self):
+        self.entries = { } # { stage: { key: result } }
+        self.used = { } # { stage: set of keys requested during the current run }
+        self.lock = threading.Lock()
+
+    def get(self, stage, key, compute):
+        "None results are not stored, so that stages that failed are tried again"
+        with self.lock:
+            self.used.setdefault(stage, set()).add(key)
+            entries = self.entries.setdefault(stage, { })
+            if key in entries: return entries[key]
+
+        with profiler.stage(stage):
+            result = compute()
+        if result is None: return result
+        with self.lock:
+            entries[key] = result
+
+        return result
+
+    def begin_run(self):
+        with self.lock:
+            self.used = { }
+
+    def end_run(self):
+        with self.lock:
+            for stage, keys in self.used.items():
+                self.entries[stage] = { x: y for x, y in self.entries[stage].items() if x in keys }
+
+    def clear(self):
+        with self.lock:
+            self.entries, self.used = { }, { }
+
+class ComputeCancelled(Exception):
+    "Raised by ComputeJob.check when the job was superseded by a newer one"
+
+class ComputeJob:
+    "Handle passed to functions run by ComputeScheduler. Jobs not created by a scheduler are never cancelled"
+
+    def __init__(self, scheduler=None, generation=0):
+        self.scheduler = scheduler
+        self.generation = generation
+
+    @property
+    def cancelled(self):
+        return self.scheduler is not None and self.scheduler.generation != self.generation
+
+    def check(self):
+        "Call between computation steps to stop early when the job is outdated"
+        if self.cancelled: raise ComputeCancelled()
+
+    def progress(self, fraction, stage=''):
+        if self.scheduler is None or self.scheduler.on_progress is None or self.cancelled: return
+        self.scheduler.on_progress(self, fraction, stage)
+
+class ComputeScheduler:
+    """Runs jobs one by one on a single worker thread. A job only starts when no new job was submitted for `debounce`
+    seconds, and submitting a job cancels all previous ones: pending jobs are dropped, running ones stop at the next
+    job.check(), and results of outdated jobs are discarded. Callbacks are called on the worker thread:
+    on_result(job, result), on_progress(job, fraction, stage), on_error(job, exception)
+    """
+
+    def __init__(self, on_result, on_progress=None, on_error=None, debounce=0.15):
+        self.on_result = on_result
+        self.on_progress = on_progress
+        self.on_error = on_error
+        self.debounce = debounce
+        self.generation = 0
+        self.request = None # (job, function) that is not started yet
+        self.request_time = 0
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, function):
+        "Schedules function(job) and cancels all previously submitted jobs"
+        with self.condition:
+            self.generation += 1
+            self.request = ComputeJob(self, self.generation), function
+            self.request_time = perf_counter()
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.request is None: self.condition.wait()
+                # wait until changes stop coming
+                while (remaining := self.request_time + self.debounce - perf_counter()) > 0:
+                    self.condition.wait(remaining)
+                job, function = self.request
+                self.request = None
+
+            try:
+                result = function(job)
+            except ComputeCancelled:
+                continue
+            except Exception as e:
+                traceback.print_exc()
+                if self.on_error is not None: self.on_error(job, e)
+                continue
+
+            if not job.cancelled: self.on_result(job, result)
+
 class ReportGroupData:
     options: list[str]
     variable: tk.StringVar
@@ -66,25 +1096,386 @@ class ReportGroupData:
         self.vis_var = vis_var
         self.vis_dropdown = vis_dropdown
 
+def write_file_atomic(path, write):
+    "Writes a temporary file with write(file) and moves it into place, so that readers never see a partial file"
+    path = Path(path)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            write(file)
+        os.chmod(temp_path, 0o644) # mkstemp makes files only readable by the owner
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+class ReportCache:
+    """Persistent cache of parsed reports. Each report gets two files in the `__reportcache__` directory next
+    to it: `<name>.npy` with decoded timings (ms) and `<name>.json` with header fields, TimingsSketch of the timings
+    and the size and modification time of the report at the moment it was parsed. An entry is only used while these still
+    match the report file, otherwise the report is parsed again and the entry is overwritten.
+    Timings of the cached entries are memory-mapped, not read. Cache directories are skipped when reading report
+    trees (see list_report_directory), but tools that don't know about them take them for report directories - delete
+    them (or use --no-cache) before passing a tree to such tools
+    """
+
+    def _entry_paths(self, path):
+        path = Path(path)
+        cache_dir = path.parent / REPORT_CACHE_DIRNAME
+        return cache_dir / (path.stem + '.json'), cache_dir / (path.stem + '.npy')
+
+    def source_key(self, path):
+        "Returns the values that identify the current state of the file at `path`"
+        stat = os.stat(path)
+        return { 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns }
+
+    def _load_meta(self, path, source_key):
+        meta_path, _ = self._entry_paths(path)
+        try:
+            with open(meta_path, 'r') as file:
+                meta = json.load(file)
+            if meta['version'] != REPORT_CACHE_VERSION or meta['source'] != source_key: return None
+        except (OSError, ValueError, KeyError):
+            return None
+
+        return meta
+
+    def load_header(self, path, source_key):
+        "Returns header fields from the cache, or None if there is no entry for `source_key`"
+        meta = self._load_meta(path, source_key)
+        return None if meta is None else meta['header']
+
+    def load(self, path, source_key):
+        "Returns (header, timings) from the cache, or None if there is no entry for `source_key`"
+        meta = self._load_meta(path, source_key)
+        if meta is None: return None
+
+        _, timings_path = self._entry_paths(path)
+        try:
+            # empty files can't be memory-mapped
+            timings = np.load(timings_path, mmap_mode='r' if meta['frame_count'] > 0 else None)
+            if len(timings) != meta['frame_count']: return None
+        except (OSError, ValueError):
+            return None
+
+        return meta['header'], timings
+
+    def load_sketch(self, path, source_key):
+        "Returns TimingsSketch from the cache, or None if there is no entry for `source_key`"
+        meta = self._load_meta(path, source_key)
+        return None if meta is None else TimingsSketch.from_dict(meta['sketch'])
+
+    def store(self, path, source_key, header, timings, sketch):
+        meta_path, timings_path = self._entry_paths(path)
+        meta = { 'version': REPORT_CACHE_VERSION, 'source': source_key, 'frame_count': len(timings), 'header': header,
+                 'sketch': sketch.to_dict() }
+        try:
+            meta_path.parent.mkdir(exist_ok=True)
+            # timings go first: meta file is what makes the entry valid
+            write_file_atomic(timings_path, lambda file: np.save(file, timings))
+            write_file_atomic(meta_path, lambda file: file.write(json.dumps(meta).encode()))
+        except OSError as e:
+            print(f'Warning: could not write cache entry for {path}: {e}')
+
+class TimingsMemoryBudget:
+    """Keeps track of decoded timings of file-backed reports. When their total size exceeds `max_bytes`, timings
+    that were not accessed for the longest time are unloaded (they are decoded again on the next access).
+    The budget should be large enough to fit all the reports used for a single plot
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.loaded = OrderedDict() # { report: size in bytes }, least recently used first
+        self.lock = threading.Lock()
+
+    def touch(self, report):
+        with self.lock:
+            if report in self.loaded: self.loaded.move_to_end(report)
+
+    def forget(self, report):
+        with self.lock:
+            self.total_bytes -= self.loaded.pop(report, 0)
+
+    def register(self, report, size):
+        with self.lock:
+            self.total_bytes += size - self.loaded.pop(report, 0)
+            self.loaded[report] = size
+            while self.total_bytes > self.max_bytes and len(self.loaded) > 1:
+                evicted, evicted_size = self.loaded.popitem(last=False)
+                self.total_bytes -= evicted_size
+                evicted._unload_timings()
+
+class TimingArenaChunk:
+    def __init__(self, size, dtype):
+        self.data = np.empty(size, dtype=dtype)
+        self.used = 0 # frames
+        self.live = 0 # number of slices that are not freed
+
+    def release(self):
+        self.data = None # memory is freed once the last view is gone
+
+class TimingArena:
+    """Keeps timings of many reports in a few large buffers (chunks) instead of an array per report. Reports get
+    slices of a chunk one after another, so reports that are loaded together (e.g. a group of a composite plot) are
+    next to each other in the arena, and concatenate_timings can join their timings without copying. Space of freed
+    slices is not reused, a chunk is released once all of its slices are freed
+    """
+
+    def __init__(self, dtype=np.float32, chunk_size=1 << 23):
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size # frames
+        self.chunk = None # chunk that new slices are taken from
+        self.lock = threading.Lock()
+
+    def allocate(self, count):
+        "Returns (chunk, offset) of a new slice of `count` frames"
+        with self.lock:
+            if self.chunk is None or self.chunk.used + count > len(self.chunk.data):
+                if self.chunk is not None and self.chunk.live == 0: self.chunk.release()
+                self.chunk = TimingArenaChunk(max(self.chunk_size, count), self.dtype)
+
+            chunk, offset = self.chunk, self.chunk.used
+            chunk.used += count
+            chunk.live += 1
+            return chunk, offset
+
+    def store(self, timings):
+        "Copies `timings` into a new slice. Returns (chunk, view of the slice)"
+        chunk, offset = self.allocate(len(timings))
+        view = chunk.data[offset:offset + len(timings)]
+        view[:] = timings
+        return chunk, view
+
+    def free(self, chunk):
+        with self.lock:
+            chunk.live -= 1
+            if chunk.live == 0 and chunk is not self.chunk: chunk.release()
+
+def concatenate_timings(arrays):
+    """np.concatenate, except that arrays that are adjacent parts of one buffer (TimingArena chunk, report archive),
+    as timings of reports loaded together usually are, are joined without copying"""
+    if len(arrays) == 1: return arrays[0]
+    root = arrays[0]
+    while isinstance(root.base, np.ndarray): root = root.base
+
+    address = arrays[0].ctypes.data
+    for x in arrays:
+        base = x
+        while isinstance(base.base, np.ndarray): base = base.base
+        if base is not root or x.dtype != root.dtype or not x.flags.c_contiguous or x.ctypes.data != address:
+            return np.concatenate(arrays)
+        address += x.nbytes
+
+    start = (arrays[0].ctypes.data - root.ctypes.data) // root.itemsize
+    return root[start:start + sum(len(x) for x in arrays)]
+
+def decode_timings(text, dtype=np.float64):
+    """Decodes the `Timings` field of a report (comma-separated frame durations in seconds) into an array of frame
+    durations in milliseconds. Parsing is done by numpy, no python objects are created for individual values"""
+    timings = np.fromstring(text, dtype=dtype, sep=',')
+    timings *= 1000
+    return timings
+
+def _parse_header_prefix(prefix):
+    "Parses report header from `prefix` - report text that precedes `Timings`. Returns None on unexpected layout"
+    try:
+        fields = json.loads(prefix.rstrip().rstrip(',') + '}')
+    except ValueError:
+        return None
+
+    if any(x not in fields for x in ['FullscreenMode', 'DeviceModel', 'OperatingSystem', 'ConstellationVersion',
+                                     'DisplayResolution']):
+        return None
+
+    return { x: fields[x] for x in REPORT_HEADER_FIELDS if x in fields }
+
+def _find_timings_field(content):
+    "Returns (start, end) of `Timings` string value in report `content` (bytes), or None if it isn't found"
+    key_index = content.find(b'"Timings"')
+    if key_index < 0: return None
+    start = content.find(b'"', key_index + len(b'"Timings"')) + 1
+    end = content.find(b'"', start)
+    if start <= 0 or end < 0: return None
+    return start, end
+
+def read_report_header(path, chunk_size=1 << 16):
+    """Parses top-level report fields that precede `Timings` without reading the rest of the file.
+    Returns None if the file does not have the expected layout"""
+    content = b''
+    with open(path, 'rb') as file:
+        while (index := content.find(b'"Timings"')) < 0:
+            chunk = file.read(chunk_size)
+            if not chunk: return None
+            content += chunk
+
+    return _parse_header_prefix(content[:index].decode('utf-8-sig'))
+
+def parse_report_file(path, dtype=np.float64):
+    """Parses header and timings of the report at `path`. The json document is never built as a whole: header is
+    parsed from the text preceding `Timings`, timings are decoded straight from the file contents and the rest of
+    the report (SimulationConfig) is skipped. Returns (header, timings)"""
+    with open(path, 'rb') as file:
+        content = file.read()
+
+    timings_range = _find_timings_field(content)
+    header = None
+    if timings_range is not None:
+        header = _parse_header_prefix(content[:content.find(b'"Timings"')].decode('utf-8-sig'))
+    if header is None: # unexpected layout, have to parse the whole thing
+        json_data = json.loads(content)
+        return { x: json_data[x] for x in REPORT_HEADER_FIELDS if x in json_data }, decode_timings(json_data['Timings'], dtype)
+
+    return header, decode_timings(content[timings_range[0]:timings_range[1]], dtype)
+
+def read_report_simulation_config(path):
+    "Parses `SimulationConfig` of the report at `path`, skipping everything before it"
+    with open(path, 'rb') as file:
+        content = file.read()
+
+    timings_range = _find_timings_field(content)
+    if timings_range is not None:
+        try:
+            return json.loads(b'{' + content[timings_range[1] + 1:].lstrip().lstrip(b','))['SimulationConfig']
+        except (ValueError, KeyError):
+            pass
+
+    return json.loads(content).get('SimulationConfig')
+
 class ReportData:
+    """Single benchmark report. Reports created with `from_file` only read the header when parsed,
+    frame timings are decoded from the file (or cache) the first time `timings` is accessed
+    """
+
     def __init__(self, timings, filename, json_data):
-        self.timings = timings
+        self._timings = timings
         self.filename = filename
         self.basename = Path(filename).stem if filename is not None else None
-        self.json_data = json_data
-
-    def _parse_file(self):
+        self._json_data = json_data
+        self.file_path = None
+        self.archive_path = None # set for reports read from a ReportArchive
+        self.cache = None
+        self.budget = None
+        self.arena = None # TimingArena to keep loaded timings in, if set
+        self._arena_chunk = None # part of the arena that holds current timings
+        self._sketch = None
+        self.timings_dtype = np.float32
+        self._load_lock = threading.Lock()
+
+    @property
+    def timings(self):
+        timings = self._timings
+        if timings is None and self.file_path is not None:
+            with self._load_lock:
+                if self._timings is None: self._load_timings()
+                timings = self._timings # the budget may unload them any moment after the lock is released
+        if self.budget is not None: self.budget.touch(self)
+
+        return timings
+
+    @timings.setter
+    def timings(self, value):
+        self._timings = value
+
+    @property
+    def sketch(self):
+        "TimingsSketch of the timings. Read from the cache (or archive) if possible, otherwise built from timings"
+        if self._sketch is None: self._sketch = self._read_cached_sketch()
+        if self._sketch is None: self._sketch = TimingsSketch.from_timings(self.timings)
+        return self._sketch
+
+    def _read_cached_sketch(self):
+        if self.cache is None or self.file_path is None: return None
+        return self.cache.load_sketch(self.file_path, self.cache.source_key(self.file_path))
+
+    @property
+    def json_data(self):
+        "Complete report. File-backed reports don't keep it in memory, so each access parses the file again"
+        if self._json_data is not None or self.file_path is None: return self._json_data
         with open(self.file_path, 'r') as file:
-            self.json_data = json.load(file)
+            return json.load(file)
+
+    @property
+    def simulation_config(self):
+        "SimulationConfig of the report. Same as with `json_data`, it is parsed again on each access"
+        if self.file_path is None: return None if self._json_data is None else self._json_data.get('SimulationConfig')
+        return read_report_simulation_config(self.file_path)
+
+    def _apply_header(self, header):
+        self.header = header
+        self.fullscreen_mode = header['FullscreenMode']
+        self.system_name = header['DeviceModel']
+        self.operating_system = header['OperatingSystem']
+        self.program_version = header['ConstellationVersion']
+        self.display_resolution = header['DisplayResolution']
 
+    def _parse_file(self):
+        "Reads the report header, timings are not decoded"
         self.filename = os.path.basename(self.file_path)
-        self.timings = 1000 * np.array(self.json_data['Timings'].split(','), dtype=float)
         self.basename = Path(self.filename).stem
-        self.fullscreen_mode = self.json_data['FullscreenMode']
-        self.system_name = self.json_data['DeviceModel']
-        self.operating_system = self.json_data['OperatingSystem']
-        self.program_version = self.json_data['ConstellationVersion']
-        self.display_resolution = self.json_data['DisplayResolution']
+
+        header = None
+        with profiler.stage('read headers'):
+            if self.cache is not None:
+                header = self.cache.load_header(self.file_path, self.cache.source_key(self.file_path))
+            if header is None:
+                header = read_report_header(self.file_path)
+
+        if header is None: # unexpected layout, have to parse the whole thing
+            with self._load_lock: self._load_timings()
+        else:
+            self._apply_header(header)
+
+    def _load_timings(self):
+        header, timings = self._read_timings()
+        self._apply_header(header)
+        self._set_loaded_timings(timings)
+
+    def _read_timings(self):
+        "Reads header and timings from the cache or the report file, without keeping them. Returns (header, timings)"
+        cached = self._read_cached_timings()
+        return cached if cached is not None else self._parse_timings()
+
+    def _read_cached_timings(self):
+        "Returns (header, timings), or None if the cache has no up to date entry for this report"
+        if self.cache is None: return None
+        with profiler.stage('read cache'):
+            cached = self.cache.load(self.file_path, self.cache.source_key(self.file_path))
+        if cached is None: return None
+
+        header, timings = cached
+        if timings.dtype != self.timings_dtype: timings = timings.astype(self.timings_dtype)
+        return header, timings
+
+    def _parse_timings(self):
+        "Parses the report file and updates the cache (timings sketch is built here too). Returns (header, timings)"
+        source_key = self.cache.source_key(self.file_path) if self.cache is not None else None
+        with profiler.stage('parse reports'):
+            header, timings = parse_report_file(self.file_path, self.timings_dtype)
+            self._sketch = TimingsSketch.from_timings(timings)
+        if self.cache is not None:
+            with profiler.stage('write cache'):
+                self.cache.store(self.file_path, source_key, header, timings, self._sketch)
+
+        return header, timings
+
+    def _set_loaded_timings(self, timings):
+        "Timings are copied to self.arena, if set"
+        arena_chunk = None
+        if self.arena is not None: arena_chunk, timings = self.arena.store(timings)
+        self._timings, self._arena_chunk = timings, arena_chunk
+        if self.budget is not None: self.budget.register(self, timings.nbytes)
+
+    def _unload_timings(self):
+        self._timings = None
+        if self._arena_chunk is not None: self.arena.free(self._arena_chunk)
+        self._arena_chunk = None
+
+    def unload_timings(self):
+        "Drops decoded timings of a file-backed report, they are decoded again on the next access"
+        if self.file_path is None: return
+        if self.budget is not None: self.budget.forget(self)
+        self._unload_timings()
 
     def parse_file(self, thread_pool=None):
         if thread_pool is not None:
@@ -92,31 +1483,149 @@ class ReportData:
         else:
             self._parse_file()
 
-    def from_file(path, thread_pool=None, do_not_parse=False):
-        report = ReportData(None, None, None)
+    def from_file(path, thread_pool=None, do_not_parse=False, cache=None, budget=None, arena=None,
+                  timings_dtype=np.float32):
+        report = ReportData(None, os.path.basename(path), None)
         report.file_path = path
+        report.cache = cache
+        report.budget = budget
+        report.arena = arena
+        report.timings_dtype = arena.dtype if arena is not None else timings_dtype
 
         if not do_not_parse:
             report.parse_file(thread_pool)
 
         return report
 
+def load_report_timings(reports, max_threads=4):
+    """Decodes timings of all `reports` in parallel threads. Timings are stored in the order of `reports`, so that
+    reports sharing a TimingArena end up next to each other"""
+    with profiler.stage('load timings'):
+        pending = iter([x for x in reports if x._timings is None and x.file_path is not None])
+        with ThreadPoolExecutor(max_workers=max_threads) as pool:
+            # only a few reports are decoded ahead of the one being stored, so that decoded timings don't pile up
+            decoding = deque((x, pool.submit(x._read_timings)) for x in itertools.islice(pending, 2 * max_threads))
+            while len(decoding) > 0:
+                report, future = decoding.popleft()
+                next_report = next(pending, None)
+                if next_report is not None: decoding.append((next_report, pool.submit(next_report._read_timings)))
+
+                header, timings = future.result()
+                with report._load_lock:
+                    if report._timings is not None: continue
+                    report._apply_header(header)
+                    report._set_loaded_timings(timings)
+
+        for report in reports: report.timings # marks reports as used for the memory budget
+
+def load_report_sketches(reports, max_threads=4):
+    "Returns TimingsSketch of each report. Only reports without a cached sketch have their timings decoded"
+    missing = []
+    for report in reports:
+        if report._sketch is None: report._sketch = report._read_cached_sketch()
+        if report._sketch is None: missing.append(report)
+
+    load_report_timings(missing, max_threads)
+    return [report.sketch for report in reports]
+
+class ReportArchive:
+    """Single file with all reports of a ReportDataStore, see `write`. File layout:
+        header (REPORT_ARCHIVE_HEADER): magic, format version, offset and size of metadata
+        timings of all reports, little endian float32 (ms), one after another, starting at `data_offset`
+        metadata: zlib compressed json, { 'reports': [{ 'chain', 'filename', 'header', 'simulation_config',
+                                                        'offset', 'count', 'sketch' }, ...] }, offset and count are in
+            frames, sketch is TimingsSketch.to_dict() (not in version 1)
+    Timings are memory mapped when the archive is opened, so opening is fast and only plotted reports are read
+    """
+    header_format = '<8sIQQ'
+    data_offset = 64
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as file:
+            magic, version, metadata_offset, metadata_size = struct.unpack(
+                self.header_format, file.read(struct.calcsize(self.header_format)))
+            if magic != REPORT_ARCHIVE_MAGIC: raise ValueError(f'{path} is not a report archive')
+            if version not in (1, REPORT_ARCHIVE_VERSION): raise ValueError(f'Unsupported report archive version: {version}')
+            file.seek(metadata_offset)
+            self.metadata = json.loads(zlib.decompress(file.read(metadata_size)))
+
+        frame_count = (metadata_offset - self.data_offset) // 4
+        self.timings = np.memmap(self.path, dtype='<f4', mode='r', offset=self.data_offset, shape=(frame_count,)) \
+            if frame_count > 0 else np.zeros(0, dtype='<f4')
+
+    def reports(self):
+        "Yields (group_chain, report) for all reports in the archive"
+        for entry in self.metadata['reports']:
+            report = ReportData(self.timings[entry['offset']:entry['offset'] + entry['count']], entry['filename'],
+                                { **entry['header'], 'SimulationConfig': entry['simulation_config'] })
+            report._apply_header(entry['header'])
+            report.archive_path = self.path
+            if 'sketch' in entry: report._sketch = TimingsSketch.from_dict(entry['sketch'])
+            yield entry['chain'], report
+
+    @staticmethod
+    def write(path, store: ReportDataStore, batch_size=16):
+        "Packs all reports of `store` into an archive at `path`. Timings are decoded `batch_size` reports at a time"
+        reports = list(store.iterate()) + [([], x) for x in store.flat_data]
+
+        def write(file):
+            file.write(b'\0' * ReportArchive.data_offset) # header is written last
+            entries, offset = [], 0
+            for i in range(0, len(reports), batch_size):
+                batch = reports[i:i + batch_size]
+                load_report_timings([x for _, x in batch], store.max_parse_workers)
+                for group_chain, report in batch:
+                    timings = np.asarray(report.timings, dtype='<f4')
+                    file.write(timings.tobytes())
+                    entries.append({ 'chain': list(group_chain), 'filename': report.filename, 'header': report.header,
+                                     'simulation_config': report.simulation_config, 'offset': offset,
+                                     'count': len(timings), 'sketch': report.sketch.to_dict() })
+                    offset += len(timings)
+                    report.unload_timings()
+
+            metadata = zlib.compress(json.dumps({ 'reports': entries }).encode())
+            metadata_offset = file.tell()
+            file.write(metadata)
+            file.seek(0)
+            file.write(struct.pack(ReportArchive.header_format, REPORT_ARCHIVE_MAGIC, REPORT_ARCHIVE_VERSION,
+                                   metadata_offset, len(metadata)))
+
+        write_file_atomic(path, write)
+        return len(reports)
+
 class ReportDataStore:
-    def __init__(self, source_directory=None, filename_regex=None, structure_only=False, parse_workers=4):
-        # only one of these 2 is used at a time
-        self.data = {}
+    def __init__(self, source_directory=None, filename_regex=None, structure_only=False, parse_workers=None, use_cache=True,
+                 memory_budget=None, timings_dtype=np.float32):
+        """memory_budget - maximum size of decoded timings (in bytes) kept in memory, see TimingsMemoryBudget
+        parse_workers - number of parsing threads (4 by default)
+        timings_dtype - float type of decoded timings. float32 (default) is plenty for frame times and takes half
+            the memory of float64
+        Loaded timings are kept in a TimingArena (self.arena)
+        """
+        # only one of these 2 is used at a time. Grouped reports are stored as rows of a table: self.reports[i]
+        # has group values self.chains[i]. Nested dict view of the same data (self.data) is built on demand
+        self.chains: list[tuple[str]] = []
+        self.reports: list[ReportData] = []
         self.flat_data = []
 
-        self.groups: list[list[str]] = []
-        self.depth = 0
+        self.row_index: dict[tuple[str], int] = {} # { group_chain: row }
+        self.group_values: list[set[str]] = []
+        self._groups, self._order, self._data = None, None, None
+        self.lock = threading.RLock() # reports can be added by ReportWatcher while the store is read
         self.filename_regex = filename_regex
-        self.source_dirs = []
-        self.max_parse_workers = parse_workers
+        self.source_dirs = [] # directories and archives the reports were loaded from
+        self.max_parse_workers = parse_workers if parse_workers is not None else 4
         self.structure_only = structure_only
         self.thread_pool = None
+        self.cache = ReportCache() if use_cache else None
+        self.budget = TimingsMemoryBudget(memory_budget) if memory_budget is not None else None
+        self.timings_dtype = timings_dtype
+        self.arena = TimingArena(timings_dtype)
+        self.revision = 0 # incremented each time store contents change
         
         if source_directory is not None:
-            self.add_from_directory(source_directory)
+            self.add_source(source_directory)
 
     def _add_data_to_store(self, data, destination, group_chain):
         key, *rest = group_chain
@@ -127,10 +1636,41 @@ class ReportDataStore:
             self._add_data_to_store(data, destination[key], rest)
     
     def _register_group_values(self, group_chain):
-        self.depth = max(self.depth, len(group_chain))
         for i in range(len(group_chain)):
-            if len(self.groups) <= i: self.groups.append([])
-            self.groups[i] = list(np.unique(self.groups[i] + [group_chain[i]]))
+            if len(self.group_values) <= i: self.group_values.append(set())
+            self.group_values[i].add(group_chain[i])
+
+    def _derive(self, rows):
+        "Makes a new store with the same settings from an iterable of (group_chain, report)"
+        store = ReportDataStore(filename_regex=self.filename_regex, parse_workers=self.max_parse_workers,
+                                use_cache=False, timings_dtype=self.timings_dtype)
+        store.cache, store.budget, store.arena = self.cache, self.budget, self.arena
+        for group_chain, report in rows:
+            store.add(group_chain, report)
+
+        return store
+
+    @property
+    def depth(self): return len(self.group_values)
+
+    @property
+    def groups(self) -> list[list[str]]:
+        "Sorted unique group values for each depth"
+        with self.lock:
+            if self._groups is None:
+                self._groups = [sorted(x) for x in self.group_values]
+            return self._groups
+
+    @property
+    def data(self) -> dict[...]:
+        "Reports as nested dicts: { group_value: { subgroup_value: ... { last_group_value: report } } }"
+        with self.lock:
+            if self._data is None:
+                data = {}
+                for group_chain, report in self.iterate():
+                    self._add_data_to_store(report, data, group_chain)
+                self._data = data
+            return self._data
 
     def _make_thread_pool(self):
         if self.thread_pool is None:
@@ -139,43 +1679,76 @@ class ReportDataStore:
     def is_flat(self): return self.flat_data != []
 
     def add(self, group_chain: list[str], data: ReportData):
-        if group_chain == []:
+        self.revision += 1
+        if len(group_chain) == 0:
             self.flat_data.append(data)
             return
 
-        self._register_group_values(group_chain)
         data.group_chain = group_chain
-        self._add_data_to_store(data, self.data, group_chain)
-
-    def get_report(self, group_chain):
-        data = self.data
-        try:
-            for i in range(len(group_chain)):
-                data = data[group_chain[i]]
-        except KeyError:
-            return None
+        group_chain = tuple(group_chain)
+        with self.lock:
+            self._order, self._data = None, None
+            row = self.row_index.get(group_chain)
+            if row is not None: # same group chain, replace the report
+                # free timings of the old one (arena slice and memory budget entry), nothing else will
+                if self.reports[row] is not data: self.reports[row].unload_timings()
+                self.reports[row] = data
+                return
 
-        return data
+            self._groups = None
+            self._register_group_values(group_chain)
+            self.row_index[group_chain] = len(self.chains)
+            self.chains.append(group_chain)
+            self.reports.append(data)
 
-    def add_file(self, path, *parents):
+    def file_group_chain(self, path, *parents):
+        "Group chain of the report at `path`. parents - groups of the directory the report is in"
         # if filename has a report index (e.g. benchmark-3-report.json), extract this index
         filename = os.path.basename(path)
         match = re.search(self.filename_regex, filename)
         if match:
             base_name = match.group(1)
             index = str(int(match.group(2)))
-            parents = list(parents) + [base_name, index]
-        else:
-            parents = list(parents) + [filename]
+            return list(parents) + [base_name, index]
+
+        return list(parents) + [filename]
+
+    def add_file(self, path, *parents):
+        self.add(self.file_group_chain(path, *parents),
+                 ReportData.from_file(path, self.thread_pool, do_not_parse=self.structure_only, cache=self.cache,
+                                      budget=self.budget, arena=self.arena))
+
+    def merge(self, other: ReportDataStore):
+        "Adds all reports of `other` store to this one"
+        other.wait_for_completion()
+        for group_chain, report in other.iterate():
+            self.add(group_chain, report)
+        self.flat_data += other.flat_data
+        self.source_dirs += [x for x in other.source_dirs if not np.any([is_child(y, x) for y in self.source_dirs])]
+        return self
 
-        self.add(parents, ReportData.from_file(path, self.thread_pool, do_not_parse=self.structure_only))
+    def add_source(self, path):
+        "Adds reports from a directory or a report archive"
+        with profiler.stage('scan sources'):
+            if Path(path).is_file():
+                self.add_from_archive(path)
+            else:
+                self.add_from_directory(path)
+
+    def add_from_archive(self, path):
+        path = Path(path)
+        for group_chain, report in ReportArchive(path).reports():
+            self.add(group_chain, report)
+        if not np.any([is_child(path, x) for x in self.source_dirs]):
+            self.source_dirs.append(path)
+
+        return self
 
     def add_from_directory(self, directory: str, *parents: list[str]):
         "parents - an ordered list of group names that this directory belongs to"
         self._make_thread_pool()
         directory = directory if isinstance(directory, Path) else Path(directory)
-        dirs = [directory / item.name for item in directory.iterdir() if item.is_dir()]
-        files = [directory / item.name for item in directory.iterdir() if item.is_file() and item.suffix == '.json']
+        dirs, files = list_report_directory(directory)
         if not np.any([is_child(directory, x) for x in self.source_dirs]):
             self.source_dirs.append(directory)
 
@@ -191,12 +1764,14 @@ class ReportDataStore:
             self.add_from_directory(subdir, *parents)
 
     def iterate(self):
-        "Go through all the stored reports. Yields tuple (group_chain, report_data)"
-        group_chains = itertools.product(*self.groups)
-        for group_chain in group_chains:
-            report = self.get_report(group_chain)
-            if report is None: continue
-            yield group_chain, report
+        "Go through all the stored reports in order of group values. Yields tuple (group_chain, report_data)"
+        with self.lock:
+            if self._order is None:
+                self._order = sorted(range(len(self.chains)), key=self.chains.__getitem__)
+            order = self._order
+
+        for row in order:
+            yield self.chains[row], self.reports[row]
 
     def build_subtree(self, selected_values: list[str], compress=True):
         """Prunes data tree based on selected group values. selected_values should have the same length
@@ -226,19 +1801,17 @@ class ReportDataStore:
 
         Returns a new ReportDataStore
         """
-        subtree = ReportDataStore()
         select_groups = [True] * len(self.groups)
         if compress:
-            select_groups = [len(x) > 1 and y is None for x, y in zip(self.groups, selected_values)]
-
-        for group_chain, report in self.iterate():
-            # filtering based on selected values
-            if np.any([y is not None and x != y for x, y in zip(group_chain, selected_values)]): continue
+            select_groups = [len(x) > 1 and y is None for x, y in zip(self.group_values, selected_values)]
 
-            selected_chain = [x for x, y in zip(group_chain, select_groups) if y]
-            subtree.add(selected_chain, report)
+        filters = [(i, x) for i, x in enumerate(selected_values) if x is not None]
+        selected_groups = [i for i, x in enumerate(select_groups) if x]
 
-        return subtree
+        rows = (([group_chain[i] for i in selected_groups], report) for group_chain, report in self.iterate()
+                if all(group_chain[i] == x for i, x in filters))
+        with profiler.stage('build subtree'):
+            return self._derive(rows)
 
     def make_flat_subtree(self, preserve_group_depth: int):
         """Flattens the data tree, preserving grouping on a specified depth. For example the following tree:
@@ -261,41 +1834,30 @@ class ReportDataStore:
 
         Currently only supports grouping on a single depth. Returns a new ReportDataStore
         """
-        subtree = ReportDataStore()
+        def flatten(group_chain):
+            return [group_chain[preserve_group_depth],
+                    '/'.join(group_chain[:preserve_group_depth] + group_chain[preserve_group_depth + 1:])]
 
-        for group_chain, report in self.iterate():
-            group_value = group_chain[preserve_group_depth]
-            new_key = '/'.join(group_chain[:preserve_group_depth] + group_chain[preserve_group_depth + 1:])
-            subtree.add([group_value, new_key], report)
-
-        return subtree
+        with profiler.stage('flatten subtree'):
+            return self._derive((flatten(group_chain), report) for group_chain, report in self.iterate())
 
     def transpose_groups(self, transpose_map: list[int]):
         """Produces a new data store with groups swapped according to transposition map
         value at index 3 in transpose_map corresponds to target group index at depth 3
         """
-        new_tree = ReportDataStore()
         if len(np.unique(transpose_map)) != len(transpose_map): 
             raise ValueError('Invalid transpose map')
 
-        for group_chain, report in self.iterate():
-            group_chain = [group_chain[x] for x in transpose_map]
-            new_tree.add(group_chain, report)
-
-        return new_tree
+        return self._derive(([group_chain[x] for x in transpose_map], report) for group_chain, report in self.iterate())
 
     def prepend_group(self, group_value):
         "Make a new tree that has one more group with a single value. This group becomes the first one"
-        new_tree = ReportDataStore()
-
-        for group_chain, report in self.iterate():
-            new_tree.add([group_value, *group_chain], report)
-
-        return new_tree
+        return self._derive(([group_value, *group_chain], report) for group_chain, report in self.iterate())
 
     def wait_for_completion(self):
         if self.thread_pool is None: return
-        self.thread_pool.shutdown(wait=True)
+        with profiler.stage('wait for headers'):
+            self.thread_pool.shutdown(wait=True)
         self.thread_pool = None
 
     def load_contents(self):
@@ -306,6 +1868,305 @@ class ReportDataStore:
 
         return self
 
+    def load_timings(self):
+        "Decodes timings of all reports in the store in parallel (otherwise they are decoded one by one on access)"
+        load_report_timings([report for _, report in self.iterate()] + self.flat_data, self.max_parse_workers)
+        return self
+
+class ReportWatcher:
+    """Polls source directories of a ReportDataStore for new and modified reports, for following benchmark runs that
+    are still in progress. A file is read once its size and modification time did not change since the previous poll,
+    so that reports that are still being written are skipped. Read reports (with timings decoded) are put to
+    self.queue as (group_chain, report), adding them to the store is up to the owner of the store
+    """
+
+    def __init__(self, store: ReportDataStore, interval=2.0, on_new_reports=None):
+        "on_new_reports - called on the watcher thread when new reports are put to the queue"
+        self.store = store
+        self.interval = interval
+        self.on_new_reports = on_new_reports
+        self.queue = queue.Queue()
+        self.known = { } # { path: file state of the report in the store }
+        self.pending = { } # { path: file state seen on the previous poll }
+        self.failed = { } # { path: file state that could not be parsed }
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        for _, report in store.iterate():
+            if report.file_path is None: continue
+            try:
+                self.known[str(report.file_path)] = self.file_state(report.file_path)
+            except OSError:
+                pass
+
+    def file_state(self, path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def scan(self, directory: Path, *parents):
+        "Yields (path, parents) of reports in `directory`, the same way ReportDataStore.add_from_directory finds them"
+        parents = list(parents) + [directory.name]
+        dirs, files = list_report_directory(directory)
+        for path in files: yield path, parents
+        for subdir in dirs: yield from self.scan(subdir, *parents)
+
+    def read_report(self, path):
+        store = self.store
+        report = ReportData.from_file(path, do_not_parse=True, cache=store.cache, budget=store.budget,
+                                      arena=store.arena)
+        report._parse_file()
+        report.timings # decode here, not on the compute thread
+
+        return report
+
+    def poll(self):
+        "Checks source directories once. Returns the number of reports put to the queue"
+        count = 0
+        for directory in list(self.store.source_dirs):
+            if not directory.is_dir(): continue # archive
+            try:
+                files = list(self.scan(directory))
+            except OSError as e:
+                print(f'Warning: could not scan {directory}: {e}')
+                continue
+
+            for path, parents in files:
+                if self.stop_event.is_set(): return count
+                try:
+                    state = self.file_state(path)
+                except OSError: # deleted in the meantime
+                    continue
+
+                key = str(path)
+                if self.known.get(key) == state or self.failed.get(key) == state: continue
+                if self.pending.get(key) != state: # new or still being written, wait for the next poll
+                    self.pending[key] = state
+                    continue
+
+                del self.pending[key]
+                try:
+                    report = self.read_report(path)
+                except Exception as e:
+                    print(f'Warning: failed to read report {path}: {e}')
+                    self.failed[key] = state # retried if the file changes again
+                    continue
+
+                self.known[key] = state
+                self.queue.put((self.store.file_group_chain(path, *parents), report))
+                count += 1
+
+        return count
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            count = self.poll()
+            if count > 0 and not self.stop_event.is_set() and self.on_new_reports is not None: self.on_new_reports()
+
+    def start(self):
+        if self.thread is not None: return
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Makes the watcher thread exit after the report it is reading, without waiting for it (it's a daemon thread,
+        stop is called on the Tk thread). Reports read after this are not reported"""
+        self.stop_event.set()
+        self.thread = None
+
+    def get_new_reports(self):
+        "Returns all reports read so far and not yet taken from the queue"
+        reports = []
+        while True:
+            try:
+                reports.append(self.queue.get_nowait())
+            except queue.Empty:
+                return reports
+
+class ReportIndex:
+    """Persistent SQLite index of reports from all directories and archives opened in the analyzer. One row per
+    report: its location, header fields and `Summary` statistics (times converted to ms, like everywhere else here),
+    so that reports can be queried across benchmark runs without opening them. Timings are never read.
+    Rows are identified by the report path (`<archive>#<group chain>` for reports in archives) and rewritten when
+    the size or modification time of the file changes, so updating the index with reports that are already in it
+    only takes a stat of each file. Use `path=':memory:'` for an index that is not saved
+    """
+    columns = [('Path', 'TEXT PRIMARY KEY'), ('Source', 'TEXT'), ('GroupChain', 'TEXT'), ('Benchmark', 'TEXT'),
+               ('RunIndex', 'INTEGER'), ('FileSize', 'INTEGER'), ('FileModified', 'INTEGER'),
+               ('ReportVersion', 'TEXT'), ('ConstellationVersion', 'TEXT'), ('ReportDateTime', 'TEXT'),
+               ('BuiltPlayer', 'INTEGER'), ('Width', 'INTEGER'), ('Height', 'INTEGER'), ('RefreshRate', 'REAL'),
+               ('FullscreenMode', 'TEXT'), ('BenchmarkConfigName', 'TEXT'), ('CooldownDuration', 'REAL'),
+               ('WarmupDuration', 'REAL'), ('DeviceModel', 'TEXT'), ('OperatingSystem', 'TEXT'),
+               ('ExecutableLocation', 'TEXT'), ('TotalFrames', 'INTEGER'), ('TotalDuration', 'REAL'),
+               ('AverageFPS', 'REAL'), ('AverageFrameTime', 'REAL'), ('FrameDurationStd', 'REAL'),
+               ('OneLowTime', 'REAL'), ('PointOneLowTime', 'REAL'), ('LongestFrameTime', 'REAL')]
+    column_names = [x for x, _ in columns]
+    indexed_columns = ['Source', 'Benchmark', 'DeviceModel', 'ConstellationVersion']
+
+    def __init__(self, path=REPORT_INDEX_PATH):
+        import sqlite3 # takes longer to import than the rest of the standard library used here
+        self.path = path
+        if path != ':memory:': Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock() # the connection is shared by the UI and loading threads
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.lock, self.db:
+            if self.db.execute('PRAGMA user_version').fetchone()[0] != REPORT_INDEX_VERSION:
+                self.db.execute('DROP TABLE IF EXISTS reports')
+                self.db.execute(f'PRAGMA user_version = {REPORT_INDEX_VERSION}')
+            self.db.execute(f'CREATE TABLE IF NOT EXISTS reports ({", ".join(f"{x} {y}" for x, y in self.columns)})')
+            for column in self.indexed_columns:
+                self.db.execute(f'CREATE INDEX IF NOT EXISTS reports_{column} ON reports ({column})')
+
+    @staticmethod
+    def open(path):
+        "Returns ReportIndex at `path`, or None (with a warning) if it can't be opened"
+        import sqlite3
+        try:
+            return ReportIndex(path)
+        except (OSError, sqlite3.Error) as e:
+            print(f'Warning: could not open report index {path}: {e}')
+            return None
+
+    @staticmethod
+    def _location(report):
+        "Returns (path, file the report is read from) of a report in the index, or None"
+        if report.file_path is not None:
+            path = Path(report.file_path).resolve()
+            return str(path), path
+        if report.archive_path is not None:
+            archive_path = Path(report.archive_path).resolve()
+            return f'{archive_path}#{"/".join(report.group_chain)}', archive_path
+
+        return None
+
+    @staticmethod
+    def _report_header(report):
+        "Header of `report`, without decoding timings if it wasn't parsed yet"
+        header = getattr(report, 'header', None)
+        if header is None and report.cache is not None:
+            header = report.cache.load_header(report.file_path, report.cache.source_key(report.file_path))
+        if header is None: header = read_report_header(report.file_path)
+        if header is None: header = parse_report_file(report.file_path)[0] # unexpected layout
+
+        return header
+
+    def _make_row(self, path, source, stat, group_chain, filename, header, filename_regex):
+        match = re.search(filename_regex, filename) if filename_regex is not None else None
+        benchmark, run_index = (match.group(1), int(match.group(2))) if match else (Path(filename).stem, None)
+        resolution = header.get('DisplayResolution') or {}
+        refresh_rate = resolution.get('refreshRate')
+        if 'refreshRateRatio' in resolution:
+            refresh_rate = resolution['refreshRateRatio']['numerator'] / resolution['refreshRateRatio']['denominator']
+        try: # dd.MM.yyyy HH:mm:ss, stored as ISO so that it sorts
+            date = datetime.strptime(header.get('ReportDateTime', ''), '%d.%m.%Y %H:%M:%S').isoformat(' ')
+        except ValueError:
+            date = header.get('ReportDateTime')
+        summary = header.get('Summary') or {}
+        # Summary times are in seconds
+        summary = { x: y if x in ('TotalFrames', 'AverageFPS') else float(f'{y * 1000:.9g}') for x, y in summary.items()
+                    if isinstance(y, (int, float)) }
+
+        row = { **{ x: header.get(x) for x in self.column_names }, **summary, 'Path': path, 'Source': source,
+                'GroupChain': '/'.join(group_chain), 'Benchmark': benchmark, 'RunIndex': run_index,
+                'FileSize': stat.st_size, 'FileModified': stat.st_mtime_ns, 'ReportDateTime': date,
+                'Width': resolution.get('width'), 'Height': resolution.get('height'), 'RefreshRate': refresh_rate }
+        return tuple(row[x] for x in self.column_names)
+
+    def update(self, store: ReportDataStore):
+        """Adds reports of `store` that are not in the index yet or were modified since they were indexed (only their
+        headers are read), and removes rows of reports that are no longer in source directories of the store.
+        Returns the number of rows written"""
+        sources = [Path(x).resolve() for x in store.source_dirs]
+        with self.lock:
+            indexed = { x: (y, z) for x, y, z in self.db.execute(
+                f'SELECT Path, FileSize, FileModified FROM reports WHERE Source IN ({", ".join("?" * len(sources))})',
+                [str(x) for x in sources]) }
+
+        rows, seen, stats = [], set(), {}
+        with profiler.stage('update index'):
+            for group_chain, report in store.iterate():
+                location = self._location(report)
+                if location is None: continue
+                path, file_path = location
+                source = next((x for x in sources if file_path == x or is_child(file_path, x)), None)
+                if source is None: continue # e.g. reports added to a derived store
+                seen.add(path)
+                if file_path not in stats: stats[file_path] = os.stat(file_path)
+                stat = stats[file_path]
+                if indexed.get(path) == (stat.st_size, stat.st_mtime_ns): continue
+
+                try:
+                    header = self._report_header(report)
+                except (OSError, ValueError, KeyError) as e:
+                    print(f'Warning: could not index {path}: {e}')
+                    continue
+                rows.append(self._make_row(path, str(source), stat, group_chain, report.filename, header,
+                                           store.filename_regex))
+
+            with self.lock, self.db:
+                self.db.executemany(f'INSERT OR REPLACE INTO reports VALUES ({", ".join("?" * len(self.columns))})', rows)
+                self.db.executemany('DELETE FROM reports WHERE Path = ?', [(x,) for x in indexed if x not in seen])
+
+        return len(rows)
+
+    @staticmethod
+    def make_filter(sources=None, benchmark=None, device=None, version=None, where=None):
+        """Builds a condition for `query`: sources - list of directories / archives, benchmark (matched against both
+        report file name and BenchmarkConfigName), device and version are case-insensitive glob patterns (`*` and
+        `?`), `where` is an SQL condition on index columns. Returns (sql, parameters)"""
+        def like(pattern): # glob to LIKE
+            return re.sub(r'([%_\\])', r'\\\1', pattern).replace('*', '%').replace('?', '_')
+
+        conditions, parameters = [], []
+        if sources is not None:
+            conditions.append(f'Source IN ({", ".join("?" * len(sources))})')
+            parameters += [str(Path(x).resolve()) for x in sources]
+        if benchmark is not None:
+            conditions.append("(Benchmark LIKE ? ESCAPE '\\' OR BenchmarkConfigName LIKE ? ESCAPE '\\')")
+            parameters += [like(benchmark)] * 2
+        for column, pattern in [('DeviceModel', device), ('ConstellationVersion', version)]:
+            if pattern is None: continue
+            conditions.append(f"{column} LIKE ? ESCAPE '\\'")
+            parameters.append(like(pattern))
+        if where is not None:
+            conditions.append(f'({where})')
+
+        return ' AND '.join(conditions), parameters
+
+    def query(self, where='', parameters=(), columns=None,
+              order_by='ConstellationVersion, DeviceModel, Benchmark, GroupChain, RunIndex'):
+        "Returns rows of the index that match `where` (see make_filter), as dicts of `columns` (all by default)"
+        columns = columns if columns is not None else self.column_names
+        sql = f'SELECT {", ".join(columns)} FROM reports' + (f' WHERE {where}' if where else '') + f' ORDER BY {order_by}'
+        with self.lock:
+            return [dict(zip(columns, x)) for x in self.db.execute(sql, parameters)]
+
+    def close(self):
+        with self.lock: self.db.close()
+
+def consistency_report(rows):
+    """Checks that reports (rows of ReportIndex) were recorded in the same conditions: operating system, device,
+    fullscreen mode, Constellation version and display resolution. Returns (number of mismatches, text)"""
+    def resolution(row):
+        values = ['?' if row[x] is None else f'{row[x]:g}' for x in ('Width', 'Height', 'RefreshRate')]
+        return '{}x{}@{}'.format(*values)
+
+    fields = [('Operating systems', lambda x: x['OperatingSystem']), ('Test devices', lambda x: x['DeviceModel']),
+              ('Fullscreen modes', lambda x: x['FullscreenMode']),
+              ('Constellation versions', lambda x: x['ConstellationVersion']), ('Resolutions', resolution)]
+    report, mismatch_count = '', 0
+    for name, value in fields:
+        values = [str(value(x)) for x in rows]
+        unique = sorted(set(values))
+        if len(unique) <= 1:
+            report += f' - {name}: {unique[0] if unique else "-"}\n'
+        else:
+            report += f' - {name}: Inconsistent values:\n'
+            report += ', '.join([f'"{x}" ({values.count(x)})' for x in unique])
+            report += '\n'
+            mismatch_count += 1
+
+    return mismatch_count, report
+
 class VariableStore:
     """
     Attributes:
@@ -375,8 +2236,12 @@ class VariableStore:
 class ReportAnalyzer:
     report_groups: list[ReportGroupData] = []
     canvas: FigureCanvasTkAgg = None
+    toolbar: NavigationToolbar2Tk = None
     reports_store: ReportDataStore = None
-    current_plotted_data: dict[...] = None
+    last_plotted_data: dict[...] = None
+    # variables that only affect how the plots look, and not data plotted
+    cosmetic_variables = ['hide_raw', 'show_separators']
+    archive_filetypes = [('Report archive', '*.rpa'), ('All files', '*')]
 
     ###
     ### Dynamic UI stuff
@@ -415,53 +2280,75 @@ class ReportAnalyzer:
 
     ###
     ### Plotting utils
-    def update_plots(self):
+    def update_plots(self, changed_variable=None):
         if self.reports_store is None: return
-        self.progress.start()
+        if changed_variable in self.cosmetic_variables and self.last_plotted_data is not None:
+            profiler.reset()
+            self.plot_composite(self.last_plotted_data) # just redraw, nothing to recompute
+            self.show_profile()
+            return
+
+        self.scheduler.submit(self.compute_plots)
+
+    def compute_plots(self, job):
+        "Runs on the scheduler thread"
+        profiler.reset()
+        job.progress(0, 'Parsing reports')
         self.reports_store.wait_for_completion()
+        job.check()
+        return self.prepare_composite_data(job)
+
+    def show_computed_plots(self, job, data):
+        if job.cancelled: return
+        self.progress['value'] = 0
+        if data is None: return # status already tells what's wrong
+
+        self.plot_composite(data)
+        self.last_plotted_data = data
+        self.show_profile()
+
+    def show_profile(self):
+        "Shows time taken by stages of the last refresh in the status bar, and prints all of them with --profile"
+        self.set_status(f'Ok ({profiler.summary()})')
+        if self.profile: print(profiler.report(), end='\n\n')
+
+    def show_progress(self, job, fraction, stage):
+        if job.cancelled: return
+        self.progress['value'] = fraction
+        if stage: self.status_label.config(text=f'{stage}...', background='lightyellow')
+
+    ###
+    ### Passing work to the Tk thread
+    def call_in_ui(self, function, *args):
+        """Calls `function` on the Tk thread. Can be called from any thread and never blocks: the Tk thread polls the
+        queue (event_generate from another thread would wait for the Tk thread, which may be waiting for the caller)"""
+        self.ui_queue.put((function, args))
+
+    def process_ui_queue(self):
+        try:
+            while True:
+                try:
+                    function, args = self.ui_queue.get_nowait()
+                except queue.Empty:
+                    return
+                function(*args)
+        finally:
+            self.root.after(UI_QUEUE_POLL_INTERVAL, self.process_ui_queue)
 
-        # plot_type = self.plot_mode_string_var.get()
-        self.current_plotted_data = None
-        def do_compute():
-            self.current_plotted_data = self.prepare_composite_data()
-            self.progress.stop()
-
-        # def do_plot():
-        #     if plot_type == 'composite':
-        #         self.plot_composite()
-        #     elif plot_type == 'FPS':
-        #         self.plot_fps_simple()
-        #     else:
-        #         self.plot_timings_simple()
-
-        worker_thread = threading.Thread(target=do_compute)
-        worker_thread.start()
-
-    # if I don't recreate the canvas, it doesn't draw it fullscreen for some reason
-    # presumably this will not be an issue if you don't need to change figure, but i didn't test
     def update_canvas(self, new_fig, recreate=False):
+        """Shows `new_fig` in a new canvas and toolbar. Composite plots keep drawing to the same figure (see
+        CompositePlotter), so this only runs when it is first shown"""
         if self.canvas is not None:
-            plt.close(self.canvas.figure)
             self.canvas.get_tk_widget().pack_forget()
+            self.toolbar.destroy()
         self.canvas = FigureCanvasTkAgg(new_fig, master=self.root)
+        # toolbar is packed first, so that it doesn't get pushed out of the window by the canvas
+        self.toolbar = NavigationToolbar2Tk(self.canvas, self.root, pack_toolbar=False)
+        self.toolbar.update()
+        self.toolbar.pack(side=tk.BOTTOM, fill=tk.X)
         self.canvas.draw()
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
-    def subplots2d(self, n, m, figsize=None):
-        if figsize is None: figsize = (n*6, m*4)
-        fig, axs = plt.subplots(n, m, figsize=figsize)
-        if not hasattr(axs, '__len__'): axs = np.array([[axs]])
-        if not hasattr(axs[0], '__len__'): axs = np.array([axs]).reshape(-1, 1)
-
-        return fig, axs
-
-    def make_subplot_grid(self, subplots_count, figsize=None):
-        n = m = math.ceil(math.sqrt(subplots_count))
-        if n * (n - 1) >= subplots_count: m -= 1
-
-        fig, axs = self.subplots2d(n, m, figsize=figsize)
-        return fig, axs.ravel()
-
     def get_selected_report_data(self, compress):
         "Returns a subset of data stored in self.reports_store. The data is pruned based on selected report groups"
         selected_values = []
@@ -477,6 +2364,9 @@ class ReportAnalyzer:
         return [x.vis_var.get() for x in self.report_groups]
 
     def set_status(self, text: str, error: bool=False):
+        if threading.current_thread() is not threading.main_thread():
+            self.call_in_ui(self.set_status, text, error)
+            return
         self.status_label.config(text=text, background='salmon' if error else 'lightgreen')
 
     def get_and_check_selected_data(self, min_depth=None, max_depth=None, compress=True):
@@ -494,83 +2384,8 @@ class ReportAnalyzer:
 
         return base_data
 
-    def display_plot(self, fig):
-        plt.tight_layout()
-        self.update_canvas(fig)
-
-    def plot_timings_simple(self):
-        base_data = self.get_and_check_selected_data(max_depth=2)
-        if base_data is None: return
-        plot_fps = self.var_store['plot_fps']
-
-        def setup_axis(ax, title):
-            ax.set_title(title)
-            ax.set_xlabel("Frame index")
-            ax.set_ylabel("FPS" if plot_fps else "Frame duration (ms)")
-
-        def plot_timings(ax, report):
-            plot_data = 1000 / report.timings if plot_fps else report.timings 
-            ax.plot(plot_data, label=report.basename)
-
-        if base_data.is_flat(): # only one plot needs to be drawn
-            fig, axs = self.make_subplot_grid(1)
-            setup_axis(axs[0], base_data.flat_data[0].basename)
-            plot_timings(axs[0], base_data.flat_data[0])
-            axs[0].legend()
-
-        else: # one or more plots in each of the subplots need to be drawn
-            base_data = base_data.data
-            fig, axs = self.make_subplot_grid(len(base_data))
-            for ax, name in zip(axs, base_data):
-                setup_axis(ax, name)
-
-                if isinstance(base_data[name], ReportData):
-                    plot_timings(ax, base_data[name])
-                else:
-                    for line_data in base_data[name]:
-                        plot_timings(ax, base_data[name][line_data])
-
-                ax.legend()
-
-        self.display_plot(fig)
-
-    def plot_fps_simple(self):
-        base_data = self.get_and_check_selected_data(max_depth=2)
-        if base_data is None: return
-
-        def setup_axis(ax, title):
-            ax.set_title(title)
-            ax.set_xlabel("Time (s)")
-            ax.set_ylabel("Frame per second")
-
-        def plot_fps(ax, report):
-            # fps_ps = 2 # fps per second == histogram bars (bins) per second
-            timings = np.cumsum(report.timings)
-            stop_time = int(math.ceil(timings[-1]))
-            ax.hist(timings, bins=stop_time, range=(0, stop_time), label=report.basename, alpha=0.5)
-
-        if base_data.is_flat(): # only one plot needs to be drawn
-            fig, axs = self.make_subplot_grid(1)
-            setup_axis(axs[0], base_data.flat_data[0].basename)
-            plot_fps(axs[0], base_data.flat_data[0])
-            axs[0].legend()
-        else:
-            base_data = base_data.data
-            fig, axs = self.make_subplot_grid(len(base_data))
-            for ax, name in zip(axs, base_data):
-                setup_axis(ax, name)
-
-                if isinstance(base_data[name], ReportData):
-                    plot_fps(ax, base_data[name])
-                else:
-                    for line_data in base_data[name]:
-                        plot_fps(ax, base_data[name][line_data])
-
-                ax.legend()
-
-        self.display_plot(fig)
-
-    def prepare_composite_data(self):
+    def arrange_selected_data(self):
+        "Selects reports for the composite plot and reorders groups according to plot tags (`Plot each` group first)"
         base_data = self.get_and_check_selected_data(min_depth=2, compress=False)
         if base_data is None: return
 
@@ -614,200 +2429,193 @@ class ReportAnalyzer:
                     plot_name = base_data.groups[i][0]
             base_data = base_data.prepend_group(plot_name)
 
+        return base_data
+
+    def collect_plot_groups(self, base_data):
+        "Reports of each group on each plot of arranged data: { plot_name: { group_value: [report, ...] } }"
+        plot_groups = { }
+        for plot_name in base_data.groups[0]: # group values associated with `Plot each` tag (which is always first)
+            # get branch of the tree with only reports for `plot_name`, and flatten with respect to grouping tag
+            data = base_data.build_subtree([plot_name] + [None] * (base_data.depth - 1), compress=False)
+            plot_groups[plot_name] = groups = { }
+            for group_chain, report in data.make_flat_subtree(1).iterate():
+                groups.setdefault(group_chain[0], []).append(report)
+
+        return plot_groups
+
+    def prepare_composite_data(self, job: ComputeJob=None):
+        """Computes data for plot_composite. Computation is split into stages (arrange, merge, density or transform,
+        smooth), and each stage is memoized in self.pipeline_cache by the options it actually depends on, so that
+        changing an option only recomputes the stages starting from the first one that uses it.
+        Progress is reported to `job`, which is also checked for cancellation between groups"""
+        if job is None: job = ComputeJob()
+        cache = self.pipeline_cache
+        cache.begin_run()
+        job.progress(0, 'Selecting reports')
+
+        selected_values = tuple(x.variable.get() for x in self.report_groups)
+        arrange_key = (self.reports_store, self.reports_store.revision, selected_values, tuple(self.get_group_plot_tags()))
+        base_data = cache.get('arrange', arrange_key, self.arrange_selected_data)
+        if base_data is None: return
+
         # get parameters
         as_distribution = self.var_store['plot_distribution']
         sort_timings = self.var_store['sort_timings']
         time_axis = self.var_store['time_axis']
         smoothing_window = self.var_store['smoothing_window']
         plot_fps = self.var_store['plot_fps']
+        log_density = self.var_store['log_density']
+        as_fps_over_time = self.var_store['fps_over_time'] and not as_distribution
+        fps_interval = self.var_store['fps_interval']
+        as_aligned = self.var_store['align_runs'] and not as_distribution and not as_fps_over_time
+        align_interval = self.var_store['align_interval']
         exclude_outliers = self.var_store['exclude_outliers']
-        base_exclusion_threshold = self.var_store['exclusion_threshold']
-
-        # prepare initial dataset, work from there
-        merged_data = { }
-        plot_names = base_data.groups[0] # group values associated with `Plot each` tag (which is always first)
-        for plot_name in plot_names:
-            composite_data = { } # { group_value: (timings, separators), ... }
-            
-            # get branch of the tree with only reports for `plot_name`, and flatten with respect to grouping tag
-            data = base_data.build_subtree([plot_name] + [None] * (base_data.depth - 1), compress=False)
-            data = data.make_flat_subtree(1).data
-
-            for group_value, subgroup in data.items(): # primary group
-                if len(subgroup) == 0: continue
-
-                for report in subgroup.values(): # flattening all other groups
-                    if len(report.timings) == 0: continue
-
-                    if group_value not in composite_data:
-                        composite_data[group_value] = []
-                    
-                    composite_data[group_value].append(report.timings)
-
-            # at this point we have a dict with complete datasets. It's time to filter out the outliers (if applicable)
-            if exclude_outliers:
-                for group_value, timings in list(composite_data.items()):
-                    exclusion_threshold = base_exclusion_threshold
-                    timings_flat = np.concatenate(timings)
-                    baseline, std = np.mean(timings_flat), np.std(timings_flat)
-                    means = np.array([np.mean(x) for x in timings])
-                    while True: # in case we try to exclude too much, increase threshold
-                        exclude = np.abs(means - baseline) > std * exclusion_threshold
-                        if np.sum(exclude) < len(timings) // 2: break
-                        exclusion_threshold *= 1.1
-
-                    composite_data[group_value] = [x for i, x in enumerate(timings) if not exclude[i]]
-            
-            # convert lists of timings to one array + separators:
-            for group_value, timings_list in list(composite_data.items()):
-                composite_data[group_value] = (np.concatenate(timings_list), np.cumsum([len(x) for x in timings_list]))
+        base_exclusion_threshold = self.var_store['exclusion_threshold'] if exclude_outliers else None
+        trim_warmup = self.var_store['trim_warmup']
+        detect_steady_state = self.var_store['detect_steady_state'] and not trim_warmup and not sort_timings
+        if as_fps_over_time and not fps_interval > 0:
+            self.set_status('FPS interval should be positive', True)
+            return None
+        if as_aligned and not align_interval > 0:
+            self.set_status('Align interval should be positive', True)
+            return None
 
-            merged_data[plot_name] = composite_data
+        # prepare initial dataset, work from there. Merged groups are keyed by their reports, so when reports are
+        # added or replaced, only the groups they belong to are computed again
+        merged_data = { } # { plot_name: { group_value: (merge_key, (timings, separators, sketch)), ... } }
+        group_count, merged_count = len({ x[:2] for x, _ in base_data.iterate() }), 0 # for progress reporting
+        for plot_name, groups in self.collect_plot_groups(base_data).items():
+            merged_data[plot_name] = group_data = { }
+            for group_value, reports in groups.items():
+                job.check()
+                job.progress(0.5 * merged_count / group_count, 'Merging groups')
+                merged_count += 1
+                merge_key = (tuple(reports), exclude_outliers, base_exclusion_threshold, trim_warmup)
+                merged = cache.get('merge', merge_key, lambda: merge_group_timings(
+                    reports, exclude_outliers, base_exclusion_threshold, trim_warmup))
+                if merged is not None: group_data[group_value] = (merge_key, merged)
 
         if as_distribution: # further processing for distribution plotting
-            def compute_density(plot_name, group_value, timings):
-                mean, std = np.mean(timings), np.std(timings)
-                rng = np.ptp(timings)
-                actual_range = (np.min(timings) - rng * 0.01, np.max(timings) + rng * 0.01)
-                visible_deviations = 3.3
-                visible_range = (mean - visible_deviations * std, mean + visible_deviations * std)
-                effective_range = (max(visible_range[0], actual_range[0]), min(visible_range[1], actual_range[1]))
-
-                x_axis = np.linspace(*effective_range, 1000)
-                density = gaussian_kde(timings)(x_axis)
-                
-                return plot_name, group_value, (x_axis, density, mean, std)
-
             with ThreadPoolExecutor(max_workers=self.max_threads) as pool:
-                distribution_data = {}
-                futures = []
-
+                futures = { }
                 for plot_name, comp_data in merged_data.items():
-                    distribution_data[plot_name] = { }
-                    futures += [
-                        pool.submit(compute_density, plot_name, group_value, timings)
-                        for group_value, (timings, separators) in comp_data.items()
-                    ]
-
-                for future in futures:
-                    plot_name, group_value, group = future.result()
-                    distribution_data[plot_name][group_value] = group
-
+                    for group_value, (merge_key, (timings, _, _)) in comp_data.items():
+                        futures[plot_name, group_value] = pool.submit(
+                            cache.get, 'density', (merge_key, log_density),
+                            lambda timings=timings: compute_timings_density(timings, log_density))
+
+                distribution_data = { x: { } for x in merged_data }
+                for i, ((plot_name, group_value), future) in enumerate(futures.items()):
+                    job.progress(0.5 + 0.5 * i / len(futures), 'Computing densities')
+                    if job.cancelled: pool.shutdown(cancel_futures=True)
+                    job.check()
+                    distribution_data[plot_name][group_value] = future.result()
+
+            cache.end_run()
             return distribution_data
 
+        if as_fps_over_time:
+            fps_data, processed_count = { }, 0
+            for plot_name, comp_data in merged_data.items():
+                fps_data[plot_name] = group = { }
+                for group_value, (merge_key, (timings, separators, _)) in comp_data.items():
+                    job.check()
+                    job.progress(0.5 + 0.5 * processed_count / group_count, 'Computing FPS')
+                    processed_count += 1
+                    x_axis, fps = cache.get('fps', (merge_key, fps_interval), lambda timings=timings,
+                                            separators=separators: fps_over_time(timings, separators, fps_interval))
+                    if len(fps) > 0: group[group_value] = (x_axis, fps)
+
+            cache.end_run()
+            return fps_data
+
+        if as_aligned:
+            aligned_data, processed_count = { }, 0
+            for plot_name, comp_data in merged_data.items():
+                aligned_data[plot_name] = group = { }
+                for group_value, (merge_key, (timings, separators, _)) in comp_data.items():
+                    job.check()
+                    job.progress(0.5 + 0.5 * processed_count / group_count, 'Aligning runs')
+                    processed_count += 1
+                    aligned = cache.get('align', (merge_key, align_interval, plot_fps), lambda timings=timings,
+                                        separators=separators: align_runs(timings, separators, align_interval, plot_fps))
+                    if len(aligned[0]) > 0: group[group_value] = aligned
+
+            cache.end_run()
+            return aligned_data
+
         # "post-processing" based on variables
         composite_data = { }
+        processed_count = 0
         for plot_name, data in merged_data.items():
             group = {}
-            for group_value, (timings, separators) in data.items():
-                x_axis = list(range(len(timings)))
-                use_time_axis = time_axis and not sort_timings
-                if use_time_axis:
-                    x_axis = np.cumsum(timings) / 1000
-                if sort_timings: # so that all plots in a group share x axis :)
-                    x_axis = np.linspace(0, 1, len(timings))
-                
-                if sort_timings:
-                    timings = np.sort(timings)
-                if plot_fps:
-                    timings = 1000 / timings
-
-                smoothed = smooth_array(timings, window_size=smoothing_window)
-
-                group[group_value] = (x_axis, timings, smoothed, separators)
+            for group_value, (merge_key, (timings, separators, sketch)) in data.items():
+                job.check()
+                job.progress(0.5 + 0.5 * processed_count / group_count, 'Processing groups')
+                processed_count += 1
+                steady_starts = np.zeros(0, dtype=np.int64)
+                if detect_steady_state: # first steady frames of runs that have warmup, in merged timings
+                    run_starts = np.concatenate(([0], separators[:-1]))
+                    steady_starts = cache.get('steady', merge_key, lambda timings=timings, separators=separators:
+                                              run_starts + steady_state_starts(timings, separators))
+                    steady_starts = steady_starts[steady_starts > run_starts]
+
+                transform_key = (merge_key, time_axis, sort_timings, plot_fps)
+                x_axis, timings = cache.get('transform', transform_key, lambda timings=timings: transform_timings(
+                    timings, time_axis, sort_timings, plot_fps))
+                smoothed = cache.get('smooth', (transform_key, smoothing_window),
+                                     lambda timings=timings: smooth_array(timings, window_size=smoothing_window))
+
+                group[group_value] = (x_axis, timings, smoothed, separators, sketch, steady_starts)
 
             composite_data[plot_name] = group
 
+        cache.end_run()
         return composite_data
 
-    def plot_composite(self, data):
-        fig, axs = self.make_subplot_grid(len(data))
+    def get_plot_options(self):
+        return { x: self.var_store[x] for x in ['plot_distribution', 'log_density', 'fps_over_time', 'align_runs',
+                                                'sort_timings', 'hide_raw', 'time_axis', 'plot_fps', 'show_separators',
+                                                'detect_steady_state'] }
 
-        sort_timings = self.var_store['sort_timings']
-        only_smoothed = self.var_store['hide_raw']
-        time_axis = self.var_store['time_axis']
-        as_distribution = self.var_store['plot_distribution']
-        plot_fps = self.var_store['plot_fps']
-        show_separators = self.var_store['show_separators']
-        use_time_axis = time_axis and not sort_timings
-
-        def plot_group(ax, data, title):
-            ax.set_title(title)
+    def plot_composite(self, data):
+        with profiler.stage('plot'):
+            if self.canvas is None or self.canvas.figure is not self.plotter.figure:
+                self.update_canvas(self.plotter.figure)
 
-            if as_distribution:
-                self.draw_density_group(ax, data)
-                return
+            if self.plotter.draw(data, self.get_plot_options()):
+                self.toolbar.update() # navigation history is for old axes
 
-            total_data = []
-            for plot_name, (x_axis, timings, smoothed, separators) in data.items():
-                color = None
-
-                if not only_smoothed or sort_timings:
-                    color = ax.plot(x_axis, timings, label=plot_name, alpha=1 if sort_timings else 0.35, lw=1)[0].get_color()
-                    total_data = np.concatenate((total_data, timings))
-
-                if not sort_timings:
-                    color = ax.plot(x_axis, smoothed, label=plot_name, color=color)[0].get_color()
-                    total_data = np.concatenate((total_data, smoothed))
-                mean = np.mean(timings)
-                ax.axhline(mean, color=color, linestyle='--', lw=3, alpha=0.6)
-                ax.text(0, mean, f'{mean:0.2f}')
-
-                if not sort_timings and show_separators:
-                    for separator in separators[:-1]:
-                        if separator <= 0: continue # shouldn't really happen but who knows
-                        x = x_axis[separator - 1]
-                        ax.axvline(x, color='k', lw=1, linestyle=':', alpha=0.5)
-
-            total_data = np.sort(total_data)
-            top_limit = total_data[int(len(total_data) * 0.999 - 0.999)] * 1.01
-            bottom_limit = total_data[int(len(total_data) * 0.001)] / 1.01
-            
-            ax.set_ylim(bottom_limit, top_limit)
-            x_label = 'Time (s)' if use_time_axis else 'Frame index'
-            if sort_timings: x_label = 'Frames'
-            ax.set_xlabel(x_label)
-            ax.set_ylabel('FPS' if plot_fps else 'Frame duration (ms)')
-            ax.legend(loc='upper left', fontsize='small')
+    def top_menu_file_open(self):
+        directory = tk.filedialog.askdirectory(title='Select directory with reports', mustexist=True)
+        self.open_reports_directory(directory)
 
-        for i, (plot_name, plot_data) in enumerate(data.items()):
-            plot_group(axs[i], plot_data, plot_name)
+    def top_menu_file_open_archive(self):
+        path = tk.filedialog.askopenfilename(title='Select report archive', filetypes=self.archive_filetypes)
+        if not path: return
+        self.open_reports_directory(path)
 
-        self.display_plot(fig)
-    
-    def draw_density_group(self, ax, data):
-        "data : dict of { plot_name: (x_values, y_values, time_mean, time_std) }"
-        # total_x, std_lims = [], []
-        last_y, step_y = None, None
-        for plot_name, (x_axis, density, mean, std) in data.items():
-            color = ax.plot(x_axis, density, label=plot_name)[0].get_color()
-            ax.fill_between(x_axis, density, color=color, alpha=0.15)
-            ax.axvline(mean, color=color, linestyle='--', lw=2, alpha=0.8)
-            ax.axvspan(mean - std, mean + std, color=color, alpha=0.2)
-            # total_x = np.concatenate((total_x, x_axis))
-            
-            if last_y is None:
-                max_density = np.max(density)
-                last_y = max_density * 0.95
-                step_y = max_density * 0.1
-            else: 
-                last_y -= step_y
-            
-            ax.text(mean, last_y, f'{mean:0.2f}')
-            # std_lims += [mean - 3 * std, mean + 3 * std]
+    def top_menu_file_export_archive(self):
+        if self.reports_store is None: return
+        path = tk.filedialog.asksaveasfilename(title='Export report archive', filetypes=self.archive_filetypes,
+                                               defaultextension='.rpa')
+        if not path: return
 
-        ax.set_xlabel('Frame duration (ms)')
-        ax.set_ylabel('Frequency')
-        ax.legend(fontsize='small')
-        # ax.set_xlim(max(np.min(total_x), np.min(std_lims)), min(np.max(total_x), np.max(std_lims)))
+        def export(store):
+            try:
+                count = ReportArchive.write(path, store)
+                self.set_status(f'Exported {count} reports to {path}')
+            except Exception as e:
+                self.set_status(f'Export failed: {e}', error=True)
 
-    def top_menu_file_open(self):
-        directory = tk.filedialog.askdirectory(title='Select directory with reports', mustexist=True)
-        self.open_reports_directory(directory)
+        self.set_status('Exporting...')
+        threading.Thread(target=export, args=(self.reports_store,), daemon=True).start()
 
     def open_reports_directory(self, directory):
         if directory is None: return
-        new_data = ReportDataStore(directory, self.report_index_regex, structure_only=True)
+        new_data = ReportDataStore(directory, self.report_index_regex, structure_only=True, use_cache=self.use_cache,
+                                   memory_budget=self.memory_budget, parse_workers=self.parse_workers,
+                                   timings_dtype=self.timings_dtype)
         if self.reports_store is None:
             self.reports_store = new_data.load_contents()
         elif self.reports_store.source_dirs[0].samefile(new_data.source_dirs[0]):
@@ -818,8 +2626,8 @@ class ReportAnalyzer:
                                                "The data from this directory is compatible with currently open "
                                                "directory. Do you want to merge the two datasets?",
                                                icon='question', type=tk.messagebox.YESNOCANCEL)
-            if result == 'yes': # just casually wasting work done by ReportDataStore() call
-                self.reports_store.add_from_directory(directory)
+            if result == 'yes':
+                self.reports_store.merge(new_data.load_contents())
             elif result == 'no':
                 self.reports_store = new_data.load_contents()
         else:
@@ -833,46 +2641,16 @@ class ReportAnalyzer:
 
         self.reset_report_groups()
         self.enumerate_report_groups([self.reports_store.data])
+        self.restart_watcher()
+        self.update_index()
         self.update_plots()
 
     def analysis_menu_consistency_report(self):
-        oses = []
-        devices = []
-        fs_modes = []
-        versions = []
-        resolutions = []
-
-        for _, report in self.reports_store.iterate():
-            oses.append(report.operating_system)
-            devices.append(report.system_name)
-            fs_modes.append(report.fullscreen_mode)
-            versions.append(report.program_version)
-            res = report.display_resolution
-            refresh_rate = res['refreshRate'] if 'refreshRate' in res else res['refreshRateRatio']['numerator'] / res['refreshRateRatio']['denominator']
-            resolutions.append(f'{res["width"]}x{res["height"]}@{refresh_rate}')
-
-        report = ''
-        mismatch_count = 0
-        def append_report(name, options, to_string=None):
-            nonlocal report, mismatch_count
-            unique = np.unique(options)
-            if to_string is not None:
-                print(type(unique[0]))
-                unique = [to_string(x) for x in unique]
-
-            if len(unique) == 1:
-                report += f' - {name}: {unique[0]}\n'
-            else:
-                report += f' - {name}: Inconsistent values:\n'
-                report += ', '.join([f'"{x}" ({options.count(x)})' for x in unique])
-                report += '\n'
-                mismatch_count += 1
-        
-        append_report('Operating systems', oses)
-        append_report('Test devices', devices)
-        append_report('Fullscreen modes', fs_modes)
-        append_report('Constellation versions', versions)
-        append_report('Resolutions', resolutions)
+        "Checks that opened reports were recorded in the same conditions. Only needs the report index, not the reports"
+        if self.reports_store is None: return
+        self.index.update(self.reports_store)
+        rows = self.index.query(*ReportIndex.make_filter(sources=self.reports_store.source_dirs))
+        mismatch_count, report = consistency_report(rows)
 
         args = (f"Consistency report: {mismatch_count} mismatches", report)
         if mismatch_count == 0:
@@ -882,20 +2660,184 @@ class ReportAnalyzer:
         else:
             tk.messagebox.showerror(*args)
 
-    def update(self):
-        try:
-            if self.current_plotted_data is not None:
-                self.plot_composite(self.current_plotted_data)
-                self.current_plotted_data = None
-        finally:
-            self.root.after(100, self.update)
+    def analysis_menu_hitch_analysis(self):
+        """Finds hitches in each group of the composite plot (see hitch_analysis) in the background and shows the
+        results in a window. Warmup is trimmed if `trim_warmup` is set, outliers are never excluded"""
+        if self.reports_store is None: return
+        base_data = self.arrange_selected_data()
+        if base_data is None: return
+        plot_groups, trim_warmup = self.collect_plot_groups(base_data), self.var_store['trim_warmup']
+
+        def analyze():
+            try:
+                group_rows, hitch_rows = [], []
+                for plot_name, groups in plot_groups.items():
+                    for group_value, reports in groups.items():
+                        merged = merge_group_timings(reports, trim_warmup=trim_warmup)
+                        if merged is None: continue
+                        with profiler.stage('hitches'):
+                            statistics, hitches = hitch_analysis(merged[0], merged[1])
+                        group = f'{plot_name}/{group_value}'
+                        group_rows.append({ 'Group': group, **statistics })
+                        hitch_rows += hitch_table(hitches, group, [x.basename for x in reports if len(x.timings) > 0])
+
+                self.set_status(f'Found {len(hitch_rows)} hitches in {len(group_rows)} groups')
+                self.call_in_ui(self.show_hitch_results, group_rows, hitch_rows)
+            except Exception as e:
+                self.set_status(f'Hitch analysis failed: {e}', error=True)
+
+        self.set_status('Looking for hitches...')
+        threading.Thread(target=analyze, daemon=True).start()
+
+    def show_hitch_results(self, group_rows, hitch_rows):
+        window = tk.Toplevel(self.root)
+        window.title('Hitch analysis')
+        columns = { 'Group': 'Group', 'Runs': 'Runs', 'Hitches': 'Hitches', 'HitchesPerMinute': 'Per minute',
+                    'TimeLost': 'Time lost (ms)', 'TimeLostPercent': 'Time lost (%)', 'MeanPeak': 'Mean peak (ms)',
+                    'IntervalMedian': 'Median interval (s)', 'IntervalMin': 'Min interval (s)',
+                    'Period': 'Period (s)', 'PeriodStrength': 'Periodicity' }
+        table = ttk.Treeview(window, columns=list(columns), show='headings', height=min(max(len(group_rows), 1), 25))
+        for key, title in columns.items():
+            table.heading(key, text=title)
+            table.column(key, width=260 if key == 'Group' else 110, anchor=tk.W if key == 'Group' else tk.E)
+        for row in group_rows:
+            table.insert('', tk.END, values=[row[x] if not isinstance(row[x], float) else '-' if math.isnan(row[x])
+                                             else f'{row[x]:.2f}' for x in columns])
+        table.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+
+        def export():
+            path = tk.filedialog.asksaveasfilename(parent=window, title='Export hitch analysis', defaultextension='.csv',
+                                                   filetypes=[('CSV', '*.csv'), ('JSON', '*.json'), ('All files', '*')])
+            if not path: return
+            write_hitch_results(path, group_rows, hitch_rows)
+            self.set_status(f'Exported hitch analysis to {path}')
+
+        ttk.Button(window, text='Export...', command=export).pack(side=tk.BOTTOM, anchor=tk.E, padx=4, pady=4)
+
+    def analysis_menu_scaling_analysis(self):
+        """Reads SimulationConfig of all opened reports in the background and shows how frame time scales with config
+        parameters (see scaling_table, fit_scaling)"""
+        if self.reports_store is None: return
+        store = self.reports_store
+
+        def analyze():
+            try:
+                rows, types = scaling_table(store, store.max_parse_workers)
+                self.set_status(f'Read configs of {len(rows)} reports')
+                self.call_in_ui(self.show_scaling_results, rows, types)
+            except Exception as e:
+                self.set_status(f'Scaling analysis failed: {e}', error=True)
+
+        self.set_status('Reading simulation configs...')
+        threading.Thread(target=analyze, daemon=True).start()
+
+    def show_scaling_results(self, rows, types):
+        window = tk.Toplevel(self.root)
+        window.title('Scaling analysis')
+        # only parameters that differ between reports are worth scaling by
+        parameters = [x for x, t in types.items() if t in (int, float) and x not in FRAME_STATISTICS
+                      and len({ row[x] for row in rows }) > 1]
+        x_var = tk.StringVar(value='Particles.ParticleCount' if 'Particles.ParticleCount' in parameters
+                             else next(iter(parameters), ''))
+        y_var = tk.StringVar(value='AverageFrameTime')
+
+        controls = tk.Frame(window)
+        controls.pack(side=tk.TOP, fill=tk.X)
+        ttk.Label(controls, text='X').pack(side=tk.LEFT, padx=4)
+        ttk.Combobox(controls, textvariable=x_var, values=parameters, state='readonly', width=40).pack(side=tk.LEFT)
+        ttk.Label(controls, text='Metric').pack(side=tk.LEFT, padx=4)
+        ttk.Combobox(controls, textvariable=y_var, values=FRAME_STATISTICS, state='readonly').pack(side=tk.LEFT)
+        fit_label = ttk.Label(window)
+        fit_label.pack(side=tk.BOTTOM, fill=tk.X)
+
+        figure = Figure(figsize=(8, 6), layout='tight')
+        canvas = FigureCanvasTkAgg(figure, master=window)
+        canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+
+        def update(*_):
+            figure.clear()
+            if x_var.get() not in types: return
+            fits = fit_scaling(rows, x_var.get(), y_var.get())
+            plot_scaling(figure.subplots(), rows, fits, x_var.get(), y_var.get())
+            canvas.draw()
+            fit_label.config(text='\n'.join(f'{x["Series"]}: {y_var.get()} = {x["Coefficient"]:.4g} * x ^ '
+                                             f'{x["Exponent"]:.3f} (R\u00b2 {x["R2"]:.3f}, {x["Points"]} reports)'
+                                             for x in fits) or 'Not enough different values to fit')
+
+        def export():
+            path = tk.filedialog.asksaveasfilename(parent=window, title='Export scaling table', defaultextension='.csv',
+                                                   filetypes=[('CSV', '*.csv'), ('JSON', '*.json'), ('All files', '*')])
+            if not path: return
+            if Path(path).suffix.lower() == '.json':
+                with open(path, 'w') as file: json.dump(rows, file, indent=4)
+            else:
+                write_csv(path, rows, list(types))
+            self.set_status(f'Exported scaling table to {path}')
+
+        ttk.Button(controls, text='Export table...', command=export).pack(side=tk.RIGHT, padx=4, pady=4)
+        x_var.trace_add('write', update)
+        y_var.trace_add('write', update)
+        update()
+
+    def update_index(self):
+        "Adds opened reports to the report index in the background (headers are read again if they are not loaded yet)"
+        threading.Thread(target=self.index.update, args=(self.reports_store,), daemon=True).start()
+
+    def restart_watcher(self):
+        if self.watcher is not None: self.watcher.stop()
+        self.watcher = None
+        if not self.watch or self.reports_store is None: return
+
+        self.watcher = ReportWatcher(self.reports_store, self.watch_interval,
+                                     on_new_reports=lambda: self.call_in_ui(self.add_watched_reports))
+        self.watcher.start()
+
+    def add_watched_reports(self):
+        "Adds reports found by the watcher to the store. Only the plot groups these reports belong to are recomputed"
+        if self.watcher is None: return
+        new_reports = self.watcher.get_new_reports()
+        if len(new_reports) == 0: return
+
+        groups = self.reports_store.groups
+        for group_chain, report in new_reports:
+            self.reports_store.add(group_chain, report)
+        print(f'Watch: added {len(new_reports)} new or modified reports')
+        self.update_index()
+
+        if self.reports_store.groups != groups: # new group values, dropdowns need new options
+            selection = [(x.variable.get(), x.vis_var.get()) for x in self.report_groups]
+            self.reset_report_groups()
+            self.enumerate_report_groups([self.reports_store.data])
+            for report_group, (value, tag) in zip(self.report_groups, selection):
+                if value in report_group.options: report_group.variable.set(value)
+                report_group.vis_var.set(tag)
 
-    def __init__(self, reports_dir):
+        self.update_plots()
+
+    def __init__(self, reports_dir, use_cache=True, memory_budget=None, parse_workers=None,
+                 timings_dtype=np.float32, watch=False, watch_interval=2.0, profile=False, index=None):
+        "index - ReportIndex to add opened reports to, a new in-memory index by default"
         self.reports_dir = reports_dir
-        self.report_index_regex = r'^(.*?)-(\d+)-report.json$'
+        self.profile = profile
+        self.watch = watch
+        self.watch_interval = watch_interval
+        self.watcher = None
+        self.use_cache = use_cache
+        self.memory_budget = memory_budget
+        self.parse_workers = parse_workers
+        self.timings_dtype = timings_dtype
+        self.report_index_regex = REPORT_INDEX_REGEX
+        self.index = index if index is not None else ReportIndex(':memory:')
+        import_gui_modules()
         matplotlib.rcParams['axes.xmargin'] = 0.01
         matplotlib.rcParams['axes.ymargin'] = 0.02
         self.max_threads = 10
+        self.plotter = CompositePlotter(Figure())
+        self.pipeline_cache = PipelineCache()
+        self.ui_queue = queue.Queue()
+        self.scheduler = ComputeScheduler(lambda job, data: self.call_in_ui(self.show_computed_plots, job, data),
+                                          lambda job, fraction, stage: self.call_in_ui(self.show_progress, job, fraction, stage),
+                                          lambda job, error: self.call_in_ui(self.show_computed_plots, job, None))
 
     def main(self):
         self.root = tk.Tk()
@@ -911,13 +2853,20 @@ class ReportAnalyzer:
         self.var_store = VariableStore(self.config_frame)
         self.var_store.register_variable('smoothing_window', tk.IntVar(value=50))
         self.var_store.register_variable('plot_distribution', tk.BooleanVar(value=False))
+        self.var_store.register_variable('log_density', tk.BooleanVar(value=False), label='Log Density Grid')
         self.var_store.register_variable('sort_timings', tk.BooleanVar(value=False))
         self.var_store.register_variable('plot_fps', tk.BooleanVar(value=False), label='Plot FPS')
+        self.var_store.register_variable('fps_over_time', tk.BooleanVar(value=False), label='FPS over time')
+        self.var_store.register_variable('fps_interval', tk.DoubleVar(value=1.0)) # seconds
+        self.var_store.register_variable('align_runs', tk.BooleanVar(value=False))
+        self.var_store.register_variable('align_interval', tk.DoubleVar(value=0.1)) # seconds
         self.var_store.register_variable('show_separators', tk.BooleanVar(value=False))
         self.var_store.register_variable('time_axis', tk.BooleanVar(value=True))
         self.var_store.register_variable('hide_raw', tk.BooleanVar(value=False), label='Hide Raw Data')
         self.var_store.register_variable('exclude_outliers', tk.BooleanVar(value=False), label='Exclude outliers')
         self.var_store.register_variable('exclusion_threshold', tk.DoubleVar(value=0.8))
+        self.var_store.register_variable('detect_steady_state', tk.BooleanVar(value=False))
+        self.var_store.register_variable('trim_warmup', tk.BooleanVar(value=False))
         self.var_store.register_callback(self.update_plots)
 
         self.left_top_frame = tk.Frame(self.top_frame)
@@ -927,7 +2876,7 @@ class ReportAnalyzer:
         self.status_label.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
         self.status_label.config(text='Hello world!')
 
-        self.progress = ttk.Progressbar(self.left_top_frame, mode='indeterminate')
+        self.progress = ttk.Progressbar(self.left_top_frame, mode='determinate', maximum=1.0)
         self.progress.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
 
         # Create a dropdown menu for selecting plotting mode
@@ -941,26 +2890,611 @@ class ReportAnalyzer:
 
         file_menu = tk.Menu(menubar, tearoff=0)
         file_menu.add_command(label="Open/Add", command=self.top_menu_file_open)
+        file_menu.add_command(label="Open/Add archive", command=self.top_menu_file_open_archive)
+        file_menu.add_command(label="Export archive", command=self.top_menu_file_export_archive)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.root.quit)
         menubar.add_cascade(label="File", menu=file_menu)
 
         analysis_menu = tk.Menu(menubar, tearoff=0)
         analysis_menu.add_command(label="Consistency report", command=self.analysis_menu_consistency_report)
+        analysis_menu.add_command(label="Hitch analysis", command=self.analysis_menu_hitch_analysis)
+        analysis_menu.add_command(label="Scaling analysis", command=self.analysis_menu_scaling_analysis)
         menubar.add_cascade(label="Analyze", menu=analysis_menu)
         self.root.config(menu=menubar)
 
+        self.root.after(0, self.process_ui_queue) # polls the queue from then on
         self.open_reports_directory(self.reports_dir)
-        self.root.after(100, self.update)
 
         # When the window contains plots, program refuses to quit when clicking `close`, so we are forcing it
         self.root.protocol("WM_DELETE_WINDOW", lambda: sys.exit(0)) # TODO : fix?
         self.root.mainloop()
 
+def group_store_reports(store, pool_levels=()):
+    """Groups reports of `store` whose group chains only differ in the run index (last level, if the file name has one)
+    and in levels listed in `pool_levels`. Reports without a run index are grouped by benchmark name, so benchmarks of
+    a directory are not pooled. Returns { group key (tuple): [(group_chain, report), ...] }"""
+    groups = {}
+    for group_chain, report in store.iterate():
+        indexed = store.filename_regex is not None and re.search(store.filename_regex, report.filename)
+        chain = group_chain[:-1] if indexed else [*group_chain[:-1], Path(report.filename).stem]
+        key = tuple(x for i, x in enumerate(chain) if i not in pool_levels)
+        groups.setdefault(key, []).append((group_chain, report))
+
+    return groups
+
+def compute_summary_statistics(store, pool_levels=(), max_threads=4, exact=False, trim_warmup=False):
+    """Computes frame_statistics of each report in `store`, as well as of report groups (see group_store_reports).
+    Group statistics are computed over all frames of group reports. Report statistics are always exact, statistics of
+    groups of several reports come from merged timing sketches (1% and 0.1% low times are estimates, within 0.5%),
+    so group timings never have to be concatenated. With `exact` group statistics are computed from timings too.
+    With `trim_warmup` all statistics are computed from timings without frames before the steady state (see
+    steady_state_starts), and report rows get the number of dropped frames in 'WarmupFrames'. Timings are unloaded as
+    soon as a group is done, so the whole store never has to fit in memory. Returns (report_rows, group_rows) - lists
+    of dicts, group rows have 'Estimated' set if their statistics come from sketches"""
+    report_rows, group_rows = [], []
+    for key, members in group_store_reports(store, pool_levels).items():
+        reports, cuts = [report for _, report in members], None
+        load_report_timings(reports, max_threads)
+        estimated = not exact and not trim_warmup and len(reports) > 1
+        if not estimated:
+            timings = [report.timings for report in reports]
+            if trim_warmup:
+                with profiler.stage('trim warmup'):
+                    cuts = steady_state_starts(concatenate_timings(timings), np.cumsum([len(x) for x in timings]))
+                    timings = [x[cut:] for x, cut in zip(timings, cuts)]
+            with profiler.stage('statistics'):
+                report_stats = [frame_statistics(x) for x in timings]
+                group_stats = frame_statistics(concatenate_timings(timings))
+            del timings
+        else:
+            with profiler.stage('statistics'):
+                report_stats = [frame_statistics(report.timings) for report in reports]
+                group_stats = TimingsSketch.merge([report.sketch for report in reports]).frame_statistics()
+
+        for i, ((group_chain, _), stats) in enumerate(zip(members, report_stats)):
+            if stats is None: continue
+            report_rows.append({ 'Group': '/'.join(key), 'Report': '/'.join(group_chain), **stats })
+            if cuts is not None: report_rows[-1]['WarmupFrames'] = int(cuts[i])
+        if group_stats is not None:
+            group_rows.append({ 'Group': '/'.join(key), 'ReportCount': len(reports), 'Estimated': estimated,
+                                **group_stats })
+
+        for report in reports: report.unload_timings()
+
+    return report_rows, group_rows
+
+def compute_hitch_statistics(store, pool_levels=(), max_threads=4, trim_warmup=False):
+    """Runs hitch_analysis on each group of reports in `store` (see group_store_reports), all runs of a group together.
+    Returns (group_rows, hitch_rows): statistics of each group and every hitch found, as lists of dicts"""
+    group_rows, hitch_rows = [], []
+    for key, members in group_store_reports(store, pool_levels).items():
+        reports = [report for _, report in members]
+        load_report_timings(reports, max_threads)
+        merged = merge_group_timings(reports, trim_warmup=trim_warmup)
+        if merged is not None:
+            with profiler.stage('hitches'):
+                statistics, hitches = hitch_analysis(merged[0], merged[1])
+            group_rows.append({ 'Group': '/'.join(key), **statistics })
+            names = ['/'.join(chain) for chain, report in members if len(report.timings) > 0]
+            hitch_rows += hitch_table(hitches, '/'.join(key), names)
+
+        for report in reports: report.unload_timings()
+
+    return group_rows, hitch_rows
+
+def hitch_table(hitches, group, report_names):
+    "Rows of hitches returned by hitch_analysis, `report_names` - names of runs of the group"
+    return [{ 'Group': group, 'Report': report_names[run], 'Start': float(start), 'HitchFrames': int(frames),
+              'TimeLost': float(time_lost), 'Peak': float(peak) }
+            for run, start, frames, time_lost, peak in zip(*hitches.values())]
+
+def write_hitch_results(path, group_rows, hitch_rows):
+    "Writes results of compute_hitch_statistics to a .json or .csv file (groups and hitches, marked by Type)"
+    if Path(path).suffix.lower() == '.json':
+        with open(path, 'w') as file:
+            json.dump({ 'groups': group_rows, 'hitches': hitch_rows }, file, indent=4)
+        return
+
+    rows = [{ 'Type': 'group', **x } for x in group_rows] + [{ 'Type': 'hitch', **x } for x in hitch_rows]
+    write_csv(path, rows, list(dict.fromkeys(['Type', *(x for row in rows[:1] + rows[-1:] for x in row)])))
+
+def flatten_config(config, prefix=''):
+    "Leaves of nested SimulationConfig dicts as { 'Section.Field': value }. Lists (curves, gradients) are left out"
+    columns = { }
+    for key, value in (config or { }).items():
+        if isinstance(value, dict): columns.update(flatten_config(value, f'{prefix}{key}.'))
+        elif not isinstance(value, list): columns[prefix + key] = value
+
+    return columns
+
+def scaling_table(store, max_threads=4):
+    """One row per report in `store`: what was run (header fields and flattened SimulationConfig, see flatten_config)
+    and how fast (frame_statistics from timing sketches, times in ms). Each column gets one type: bool, int, float or
+    str (ints mixed with floats become floats, anything else mixed and columns without values become str), missing
+    values are None. Returns (rows, { column: type })"""
+    members = [(chain, report) for chain, report in store.iterate()] + [([], x) for x in store.flat_data]
+    reports = [report for _, report in members]
+    sketches = load_report_sketches(reports, max_threads)
+    with profiler.stage('read configs'), ThreadPoolExecutor(max_workers=max_threads) as pool:
+        configs = list(pool.map(lambda x: x.simulation_config, reports))
+
+    rows = []
+    for (chain, report), sketch, config in zip(members, sketches, configs):
+        statistics = sketch.frame_statistics()
+        if statistics is None: continue
+        header = ReportIndex._report_header(report)
+        resolution = header.get('DisplayResolution') or { }
+        rows.append({ 'Report': '/'.join(chain) or report.basename, 'Benchmark': benchmark_name(report),
+                      **{ x: header.get(x) for x in ['BenchmarkConfigName', 'ConstellationVersion', 'DeviceModel'] },
+                      'Width': resolution.get('width'), 'Height': resolution.get('height'),
+                      **statistics, **flatten_config(config) })
+
+    types = { }
+    for row in rows:
+        for key, value in row.items():
+            kind = None if value is None else type(value) if isinstance(value, (bool, int, float)) else str
+            previous = types.setdefault(key, kind)
+            if previous is None or kind is None: types[key] = previous or kind
+            elif previous is not kind: types[key] = float if { previous, kind } == { int, float } else str
+    types = { x: y or str for x, y in types.items() } # columns that are None in every row
+
+    for row in rows:
+        for key, kind in types.items():
+            value = row.get(key)
+            row[key] = None if value is None else kind(value)
+
+    return rows, types
+
+def fit_scaling(rows, x_column, y_column, series_columns=('ConstellationVersion',)):
+    """Fits y = Coefficient * x ^ Exponent to `rows` (see scaling_table) of each series - rows with the same values of
+    `series_columns`, by least squares on log-log scale. Rows without positive x and y are left out, series need at
+    least 2 different x values. R2 is the coefficient of determination of the fit in log space.
+    Returns a list of dicts: Series, Points, MinX, MaxX, Exponent, Coefficient, R2"""
+    series = { }
+    for row in rows:
+        x, y = row.get(x_column), row.get(y_column)
+        if isinstance(x, bool) or not isinstance(x, (int, float)) or not isinstance(y, (int, float)): continue
+        if x <= 0 or y <= 0: continue
+        series.setdefault(' / '.join(str(row.get(c)) for c in series_columns), []).append((x, y))
+
+    fits = []
+    for name, points in sorted(series.items()):
+        x, y = np.log(np.array(points, dtype=np.float64)).T
+        if len(np.unique(x)) < 2: continue
+        exponent, intercept = np.polyfit(x, y, 1)
+        residual, total = np.sum((y - (exponent * x + intercept)) ** 2), np.sum((y - np.mean(y)) ** 2)
+        fits.append({ 'Series': name, 'Points': len(points), 'MinX': float(np.exp(np.min(x))),
+                      'MaxX': float(np.exp(np.max(x))), 'Exponent': float(exponent),
+                      'Coefficient': float(np.exp(intercept)), 'R2': float(1 - residual / total) if total > 0 else 1.0 })
+
+    return fits
+
+def plot_scaling(ax, rows, fits, x_column, y_column, series_columns=('ConstellationVersion',)):
+    "Draws rows of each series fitted by fit_scaling and their fitted curves on log-log axes"
+    for fit in fits:
+        points = np.array([(row[x_column], row[y_column]) for row in rows
+                           if ' / '.join(str(row.get(c)) for c in series_columns) == fit['Series']
+                           and not isinstance(row[x_column], bool) and row[x_column] > 0 and row[y_column] > 0])
+        color = ax.plot(*points.T, linestyle='', marker='o', alpha=0.6)[0].get_color()
+        x = np.geomspace(fit['MinX'], fit['MaxX'], 50)
+        ax.plot(x, fit['Coefficient'] * x ** fit['Exponent'], color=color,
+                label=f'{fit["Series"]}: x^{fit["Exponent"]:.2f} (R\u00b2 {fit["R2"]:.2f})')
+
+    ax.set_xscale('log')
+    ax.set_yscale('log')
+    ax.set_xlabel(x_column)
+    ax.set_ylabel(y_column)
+    if len(fits) > 0: ax.legend(fontsize='small')
+
+def benchmark_name(report, filename_regex=REPORT_INDEX_REGEX):
+    "Name of the benchmark `report` belongs to: its file name without the run index (see REPORT_INDEX_REGEX)"
+    match = re.search(filename_regex, report.filename)
+    return match.group(1) if match else Path(report.filename).stem
+
+def compare_stores(baseline, candidate, resamples=1000, blocks=64, confidence=0.95, seed=0, max_threads=4):
+    """Compares frame times of each benchmark in `baseline` store against the same benchmark in `candidate`. Reports
+    are matched by benchmark name (see benchmark_name), all runs of a benchmark are pooled, wherever they are in the
+    tree. Mean, 1% low and 0.1% low frame times are exact, their changes get bootstrap confidence intervals.
+
+    Bootstrap is hierarchical: runs of a benchmark usually differ more than frames within a run, so each resample
+    first draws reports (with replacement), then contiguous blocks of frames within each drawn report - single frames
+    are autocorrelated (hitches come in bursts, performance drifts), so they are not resampled one by one. Timings of
+    each report are split into about `blocks` / (number of reports) blocks, each reduced to its frame count, sum and
+    histogram on TimingsSketch buckets, so a resample is a weighted sum of block histograms. Resamples of all
+    benchmarks are computed at once as a single product of the resampling weights and the histograms, and quantiles
+    are read from the cumulative histograms (within 0.5%).
+    Returns (rows - list of dicts, one per benchmark and metric, benchmarks only in baseline, only in candidate)"""
+    def group(store):
+        groups = {}
+        for _, report in store.iterate():
+            groups.setdefault(benchmark_name(report, store.filename_regex), []).append(report)
+        return groups
+
+    baseline_groups, candidate_groups = group(baseline), group(candidate)
+    names = sorted(baseline_groups.keys() & candidate_groups.keys())
+
+    # exact statistics and block summaries of every benchmark, timings are unloaded right after
+    statistics, summaries, compared = [], [], []
+    for name in names:
+        load_report_timings(baseline_groups[name] + candidate_groups[name], max_threads)
+        sides = [[x for x in reports if len(x.timings) > 0] for reports in (baseline_groups[name], candidate_groups[name])]
+        if len(sides[0]) == 0 or len(sides[1]) == 0: continue
+        compared.append(name)
+        with profiler.stage('block summaries'):
+            timings = [concatenate_timings([x.timings for x in reports]) for reports in sides]
+            buckets = [TimingsSketch.bucket_indices(x) for x in timings]
+            first_bucket = min(int(np.min(x)) for x in buckets)
+            bucket_count = max(int(np.max(x)) for x in buckets) - first_bucket + 1
+            summary = []
+            for reports, side_timings, side_buckets in zip(sides, timings, buckets):
+                # block b of report r gets index r * report_blocks + b, unused indices up to `blocks` stay empty
+                report_blocks = max(blocks // len(reports), 1)
+                lengths = np.array([len(x.timings) for x in reports])
+                report = np.repeat(np.arange(len(reports)), lengths)
+                position = np.arange(len(side_timings)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+                block = report * report_blocks + position * report_blocks // lengths[report]
+                total_blocks = max(blocks, len(reports) * report_blocks)
+                histograms = np.bincount(block * bucket_count + side_buckets - first_bucket,
+                                         minlength=total_blocks * bucket_count).reshape(total_blocks, bucket_count)
+                summary.append((np.bincount(block, minlength=total_blocks), np.bincount(block, side_timings, total_blocks),
+                                histograms, len(reports), report_blocks))
+            statistics.append([frame_statistics(x) for x in timings])
+            summaries.append((first_bucket, summary))
+        del timings, buckets
+        for report in baseline_groups[name] + candidate_groups[name]: report.unload_timings()
+
+    # bootstrap, in batches of benchmarks so that resampled histograms don't take too much memory
+    rng = np.random.default_rng(seed)
+    bootstrap = [] # { metric: resampled values of both sides (2, resamples) } per benchmark
+    with profiler.stage('bootstrap'):
+        start = 0
+        sizes = [(x[0][2].shape[1], max(len(y[0]) for y in x)) for _, x in summaries] # (buckets, blocks)
+        while start < len(summaries):
+            end, width, block_count = start, 0, 0
+            while end < len(summaries):
+                next_width, next_block_count = max(width, sizes[end][0]), max(block_count, sizes[end][1])
+                # resampled histograms, weights and block histograms of the batch
+                size = 2 * (end - start + 1) * (resamples * (next_width + next_block_count) + next_block_count * next_width)
+                if end > start and size > 1 << 24: break
+                width, block_count, end = next_width, next_block_count, end + 1
+
+            batch = summaries[start:end]
+            counts = np.zeros((len(batch), 2, block_count)) # (benchmark, side, block)
+            sums = np.zeros((len(batch), 2, block_count))
+            histograms = np.zeros((len(batch), 2, block_count, width))
+            weights = np.zeros((len(batch), 2, resamples, block_count))
+            for i, (_, summary) in enumerate(batch):
+                for side, (block_counts, block_sums, x, report_count, report_blocks) in enumerate(summary):
+                    counts[i, side, :len(block_counts)], sums[i, side, :len(block_sums)] = block_counts, block_sums
+                    histograms[i, side, :x.shape[0], :x.shape[1]] = x
+                    # reports first, then blocks within each drawn report (as many times as it was drawn)
+                    drawn = rng.multinomial(report_count, np.full(report_count, 1 / report_count), size=resamples)
+                    drawn_blocks = rng.multinomial(drawn * report_blocks, np.full(report_blocks, 1 / report_blocks)) \
+                        if report_blocks > 1 else drawn
+                    weights[i, side, :, :report_count * report_blocks] = drawn_blocks.reshape(resamples, -1)
+            first_buckets = np.array([x for x, _ in batch])[:, None, None]
+
+            frame_counts = (weights @ counts[..., None])[..., 0]
+            values = { 'AverageFrameTime': (weights @ sums[..., None])[..., 0] / np.maximum(frame_counts, 1) }
+            cumulative = np.cumsum(weights @ histograms, axis=-1) # (benchmark, side, resample, bucket)
+            # same ranks as in frame_statistics
+            for metric, fraction in [('OneLowTime', 100), ('PointOneLowTime', 1000)]:
+                ranks = frame_counts - 1 - np.floor(frame_counts / fraction)
+                bucket = np.sum(cumulative <= ranks[..., None], axis=-1) + first_buckets
+                values[metric] = TimingsSketch.bucket_ratio ** (bucket + 0.5)
+            bootstrap += [{ x: y[i] for x, y in values.items() } for i in range(len(batch))]
+            start = end
+
+    rows, tail = [], (1 - confidence) / 2 * 100
+    for name, (base_stats, candidate_stats), resampled in zip(compared, statistics, bootstrap):
+        for metric in ['AverageFrameTime', 'OneLowTime', 'PointOneLowTime']:
+            base_value, candidate_value = base_stats[metric], candidate_stats[metric]
+            change = (resampled[metric][1] / resampled[metric][0] - 1) * 100
+            low, high = np.percentile(change, [tail, 100 - tail])
+            rows.append({ 'Benchmark': name, 'Metric': metric, 'Baseline': base_value, 'Candidate': candidate_value,
+                          'Change': candidate_value - base_value, 'ChangePercent': (candidate_value / base_value - 1) * 100,
+                          'LowPercent': float(low), 'HighPercent': float(high),
+                          'BaselineReports': len(baseline_groups[name]), 'CandidateReports': len(candidate_groups[name]) })
+
+    return rows, sorted(baseline_groups.keys() - candidate_groups.keys()), sorted(candidate_groups.keys() - baseline_groups.keys())
+
+def run_headless(args):
+    "Entry point of `--headless`: prints summary statistics of reports in `args.dir` and writes them to `args.output`"
+    store = ReportDataStore(args.dir, REPORT_INDEX_REGEX, structure_only=True, use_cache=not args.no_cache,
+                            parse_workers=args.parse_workers,
+                            timings_dtype=np.float64 if args.float64 else np.float32).load_contents()
+    store.wait_for_completion()
+    index = ReportIndex.open(args.index) if args.index is not None and not args.no_index else None
+    if index is not None: index.update(store)
+    report_rows, group_rows = compute_summary_statistics(store, args.pool_level, store.max_parse_workers, args.exact,
+                                                         args.trim_warmup)
+
+    columns = ['AverageFPS', 'AverageFrameTime', 'FrameDurationStd', 'OneLowTime', 'PointOneLowTime', 'LongestFrameTime']
+    name_width = max([len(x['Group']) for x in group_rows] + [5])
+    print(f'{"Group":<{name_width}} {"Reports":>7} ' + ' '.join(f'{x:>16}' for x in columns))
+    for row in group_rows:
+        print(f'{row["Group"]:<{name_width}} {row["ReportCount"]:>7} ' + ' '.join(f'{row[x]:>16.3f}' for x in columns))
+    if any(x['Estimated'] for x in group_rows):
+        print('1% and 0.1% low times of groups of several reports are estimates (within 0.5%), see --exact')
+
+    for output in args.output:
+        if Path(output).suffix.lower() == '.json':
+            with open(output, 'w') as file:
+                json.dump({ 'reports': report_rows, 'groups': group_rows }, file, indent=4)
+        else:
+            rows = [{ 'Type': 'group', **x } for x in group_rows] + [{ 'Type': 'report', **x } for x in report_rows]
+            write_csv(output, rows, ['Type', 'Group', 'Report', 'ReportCount', 'Estimated',
+                                     *FRAME_STATISTICS, *(['WarmupFrames'] if args.trim_warmup else [])])
+
+    return 0 if len(report_rows) > 0 else 1
+
+def write_csv(path, rows, fields):
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def run_compare(args):
+    """Entry point of `--compare`: compares frame times of benchmarks in `args.candidate` against `args.baseline`.
+    A metric regressed if it got slower by more than `args.threshold` percent and the slowdown is significant (the
+    confidence interval of the change is above zero). Returns 1 if anything regressed, 2 if there is nothing to
+    compare, 0 otherwise"""
+    stores = [ReportDataStore(x, REPORT_INDEX_REGEX, structure_only=True, use_cache=not args.no_cache,
+                              parse_workers=args.parse_workers,
+                              timings_dtype=np.float64 if args.float64 else np.float32) for x in (args.baseline, args.candidate)]
+    rows, baseline_only, candidate_only = compare_stores(*stores, resamples=args.bootstrap, confidence=args.confidence,
+                                                         max_threads=stores[0].max_parse_workers)
+    if len(baseline_only) > 0: print(f'Only in baseline: {", ".join(baseline_only)}')
+    if len(candidate_only) > 0: print(f'Only in candidate: {", ".join(candidate_only)}')
+    if len(rows) == 0:
+        print('No benchmarks to compare')
+        return 2
+
+    for row in rows:
+        row['Verdict'] = 'regression' if row['ChangePercent'] > args.threshold and row['LowPercent'] > 0 else \
+            'improvement' if row['ChangePercent'] < -args.threshold and row['HighPercent'] < 0 else ''
+
+    name_width = max(len(x['Benchmark']) for x in rows)
+    interval = f'{args.confidence * 100:g}% CI'
+    print(f'{"Benchmark":<{name_width}} {"Metric":<16} {"Baseline":>10} {"Candidate":>10} {"Change":>9} {interval:>18}')
+    for row in rows:
+        interval = f'[{row["LowPercent"]:+.1f}%, {row["HighPercent"]:+.1f}%]'
+        print(f'{row["Benchmark"]:<{name_width}} {row["Metric"]:<16} {row["Baseline"]:>10.3f} {row["Candidate"]:>10.3f} '
+              f'{row["ChangePercent"]:>+8.1f}% {interval:>18} {row["Verdict"].upper()}')
+
+    regressions = [x for x in rows if x['Verdict'] == 'regression']
+    print(f'{len(regressions)} regressions over {args.threshold:g}% in {len(rows) // len(set(x["Metric"] for x in rows))} benchmarks')
+    for output in args.output:
+        if Path(output).suffix.lower() == '.json':
+            with open(output, 'w') as file:
+                json.dump({ 'threshold': args.threshold, 'confidence': args.confidence, 'rows': rows }, file, indent=4)
+        else:
+            write_csv(output, rows, list(rows[0].keys()))
+
+    return 1 if len(regressions) > 0 else 0
+
+def run_hitches(args):
+    """Entry point of `--hitches`: prints hitch statistics of each group of reports in `args.dir` (see
+    hitch_analysis) and writes them, along with all hitches, to `args.output`"""
+    store = ReportDataStore(args.dir, REPORT_INDEX_REGEX, structure_only=True, use_cache=not args.no_cache,
+                            parse_workers=args.parse_workers,
+                            timings_dtype=np.float64 if args.float64 else np.float32).load_contents()
+    store.wait_for_completion()
+    group_rows, hitch_rows = compute_hitch_statistics(store, args.pool_level, store.max_parse_workers, args.trim_warmup)
+    if len(group_rows) == 0:
+        print('No reports with frames')
+        return 1
+
+    name_width = max(len(x['Group']) for x in group_rows)
+    print(f'{"Group":<{name_width}} {"Runs":>5} {"Hitches":>8} {"Per min":>8} {"Lost %":>7} {"Interval (s)":>13} '
+          f'{"Period (s)":>11} {"Strength":>9}')
+    for row in group_rows:
+        print(f'{row["Group"]:<{name_width}} {row["Runs"]:>5} {row["Hitches"]:>8} {row["HitchesPerMinute"]:>8.2f} '
+              f'{row["TimeLostPercent"]:>7.2f} {row["IntervalMedian"]:>13.3f} {row["Period"]:>11.2f} '
+              f'{row["PeriodStrength"]:>9.2f}')
+
+    for output in args.output:
+        write_hitch_results(output, group_rows, hitch_rows)
+
+    return 0
+
+def run_scaling(args):
+    """Entry point of `--scaling`: fits `args.scaling_metric` against `args.scaling_x` for each version of reports in
+    `args.dir` (see fit_scaling), prints the fits and writes the table of all reports (.csv, .json) or the plot (any
+    other extension matplotlib can save) to `args.output`"""
+    store = ReportDataStore(args.dir, REPORT_INDEX_REGEX, structure_only=True, use_cache=not args.no_cache,
+                            parse_workers=args.parse_workers,
+                            timings_dtype=np.float64 if args.float64 else np.float32).load_contents()
+    store.wait_for_completion()
+    rows, types = scaling_table(store, store.max_parse_workers)
+    for column in (args.scaling_x, args.scaling_metric):
+        if types.get(column) not in (int, float):
+            print(f'No numeric column `{column}`, numeric columns: '
+                  f'{", ".join(x for x, t in types.items() if t in (int, float))}')
+            return 2
+
+    fits = fit_scaling(rows, args.scaling_x, args.scaling_metric)
+    print(f'{args.scaling_metric} ~ {args.scaling_x} ^ Exponent')
+    name_width = max([len(x['Series']) for x in fits] + [7])
+    print(f'{"Version":<{name_width}} {"Points":>7} {"Exponent":>9} {"Coefficient":>12} {"R2":>6} {"Range":>22}')
+    for fit in fits:
+        x_range = f'{fit["MinX"]:g} - {fit["MaxX"]:g}'
+        print(f'{fit["Series"]:<{name_width}} {fit["Points"]:>7} {fit["Exponent"]:>9.3f} {fit["Coefficient"]:>12.4g} '
+              f'{fit["R2"]:>6.3f} {x_range:>22}')
+
+    for output in args.output:
+        suffix = Path(output).suffix.lower()
+        if suffix == '.json':
+            with open(output, 'w') as file:
+                json.dump({ 'x': args.scaling_x, 'metric': args.scaling_metric, 'fits': fits, 'reports': rows }, file,
+                          indent=4)
+        elif suffix == '.csv':
+            write_csv(output, rows, list(types))
+        else:
+            from matplotlib.figure import Figure
+            figure = Figure(figsize=(8, 6), layout='tight')
+            plot_scaling(figure.subplots(), rows, fits, args.scaling_x, args.scaling_metric)
+            figure.savefig(output)
+
+    return 0 if len(fits) > 0 else 1
+
+def run_query(args):
+    """Entry point of `--query`: prints reports from the report index that match the filters, optionally with their
+    consistency report. Reports in `args.dir` (if given) are indexed first"""
+    import sqlite3
+    index = ReportIndex.open(args.index or REPORT_INDEX_PATH) if not args.no_index else None
+    if index is None: index = ReportIndex(':memory:') # only reports in `args.dir`
+    if args.dir is not None:
+        store = ReportDataStore(args.dir, REPORT_INDEX_REGEX, structure_only=True, use_cache=not args.no_cache)
+        print(f'Indexed {index.update(store)} new or modified reports in {args.dir}')
+
+    try:
+        start = perf_counter()
+        rows = index.query(*ReportIndex.make_filter(benchmark=args.benchmark, device=args.device,
+                                                    version=args.constellation_version, where=args.where))
+    except sqlite3.Error as e:
+        print(f'Invalid query: {e}')
+        return 2
+
+    columns = ['ConstellationVersion', 'DeviceModel', 'GroupChain', 'AverageFPS', 'AverageFrameTime', 'OneLowTime',
+               'PointOneLowTime']
+    widths = [max([len(x)] + [len(str(row[x])) for row in rows]) for x in columns[:3]] + [16] * 4
+    print(' '.join(f'{x:<{y}}' if i < 3 else f'{x:>{y}}' for i, (x, y) in enumerate(zip(columns, widths))))
+    for row in rows:
+        print(' '.join(f'{str(row[x]):<{y}}' if i < 3 else f'{row[x] or 0:>{y}.3f}'
+                       for i, (x, y) in enumerate(zip(columns, widths))))
+    print(f'{len(rows)} reports ({(perf_counter() - start) * 1000:.1f} ms)')
+
+    if args.consistency:
+        mismatch_count, report = consistency_report(rows)
+        print(f'Consistency report: {mismatch_count} mismatches\n{report}', end='')
+    for output in args.output:
+        if Path(output).suffix.lower() == '.json':
+            with open(output, 'w') as file:
+                json.dump({ 'reports': rows }, file, indent=4)
+        else:
+            write_csv(output, rows, ReportIndex.column_names)
+
+    return 0 if len(rows) > 0 else 1
+
+def run_export_archive(args):
+    "Entry point of `--export-archive`: packs reports in `args.dir` into a single archive file"
+    store = ReportDataStore(args.dir, REPORT_INDEX_REGEX, structure_only=True, use_cache=not args.no_cache,
+                            parse_workers=args.parse_workers)
+    start = perf_counter()
+    count = ReportArchive.write(args.export_archive, store)
+    size = os.path.getsize(args.export_archive) / 1024 / 1024
+    print(f'Packed {count} reports into {args.export_archive} ({size:.1f} MB) in {perf_counter() - start:.1f}s')
+
+    return 0 if count > 0 else 1
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Helper tool to visualize multiple benchmark reports')
-    parser.add_argument('--dir', help='Path to (potentially nested) directory with reports')
+    parser.add_argument('--dir', help='Path to (potentially nested) directory with reports, or a report archive')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write parsed reports in '
+                        f'`{REPORT_CACHE_DIRNAME}` directories. They are written next to the reports, inside report '
+                        'trees, and are skipped when reading them, but older versions of this tool fail on them')
+    parser.add_argument('--memory-budget', type=float, help='Maximum size of frame timings (in MB) kept in memory at once')
+    parser.add_argument('--parse-workers', type=int, help='Number of parsing threads (default: 4)')
+    parser.add_argument('--float64', action='store_true', help='Keep frame timings as float64 instead of float32')
+    parser.add_argument('--float32', action='store_true', help=argparse.SUPPRESS) # the default now, kept for old scripts
+    parser.add_argument('--parse-processes', action='store_true', help=argparse.SUPPRESS) # removed, ignored
+    parser.add_argument('--headless', action='store_true', help='Print summary statistics of reports in --dir without '
+                        'opening the GUI. Times are in ms')
+    parser.add_argument('--output', action='append', default=[], help='(--headless, --query, --compare, --hitches, '
+                        '--scaling) Write statistics of all reports (and groups), comparison, hitch or scaling analysis '
+                        'results to this file (.csv or .json). Can be specified multiple times')
+    parser.add_argument('--exact', action='store_true', help='(--headless) Compute 1%% and 0.1%% low times of groups '
+                        'from all frames instead of estimating them (within 0.5%%) from timing sketches. Report '
+                        'statistics are always exact')
+    parser.add_argument('--pool-level', type=int, action='append', default=[], help='(--headless, --hitches) Also merge '
+                        'reports that only differ on this depth of the directory tree (e.g. run1, run2, ...) into one '
+                        'group')
+    parser.add_argument('--trim-warmup', action='store_true', help='(--headless, --hitches) Leave out frames before the '
+                        'steady state of each report, detected from changes in frame time after the warmup')
+    parser.add_argument('--hitches', action='store_true', help='Print hitch statistics of each group of reports in '
+                        '--dir (hitch rate, time lost, intervals between hitches and their period) without opening '
+                        'the GUI')
+    parser.add_argument('--watch', action='store_true', help='Keep checking opened directories for new and modified '
+                        'reports (e.g. while benchmarks are still running) and add them to the plots')
+    parser.add_argument('--watch-interval', type=float, default=2.0, help='(--watch) Seconds between checks')
+    parser.add_argument('--profile', action='store_true', help='Print time taken by each stage of loading, computing and '
+                        'drawing plots (after each refresh in the GUI)')
+    parser.add_argument('--profile-trace', metavar='PATH', help='Write all measured stages to this file on exit, in Chrome '
+                        'trace format (open in chrome://tracing or ui.perfetto.dev)')
+    parser.add_argument('--index', metavar='PATH', help='SQLite index of report headers and summaries, filled with all '
+                        f'opened reports. Only --query uses an index file by default ({REPORT_INDEX_PATH})')
+    parser.add_argument('--no-index', action='store_true', help='Do not use an index file (--query only searches --dir)')
+    parser.add_argument('--query', action='store_true', help='Print reports from the index (after indexing --dir, if '
+                        'given) that match --benchmark, --device, --constellation-version and --where, and exit')
+    parser.add_argument('--benchmark', metavar='PATTERN', help='(--query) Report file name or BenchmarkConfigName, '
+                        'glob pattern (e.g. "100k-*")')
+    parser.add_argument('--device', metavar='PATTERN', help='(--query) DeviceModel, glob pattern')
+    parser.add_argument('--constellation-version', metavar='PATTERN', help='(--query) ConstellationVersion, glob pattern')
+    parser.add_argument('--where', metavar='SQL', help='(--query) SQL condition on index columns, e.g. '
+                        '"AverageFPS < 60 AND ReportDateTime > \'2024-01-01\'"')
+    parser.add_argument('--consistency', action='store_true', help='(--query) Also print whether the reports were '
+                        'recorded on the same system, resolution and version')
+    parser.add_argument('--compare', action='store_true', help='Compare frame times of each benchmark in --candidate '
+                        'against --baseline (mean, 1%% and 0.1%% low), exit with code 1 if any got slower by more '
+                        'than --threshold')
+    parser.add_argument('--baseline', metavar='DIR', help='(--compare) Reports (directory or archive) to compare against')
+    parser.add_argument('--candidate', metavar='DIR', help='(--compare) Reports to check for regressions')
+    parser.add_argument('--threshold', type=float, default=5.0, metavar='PERCENT', help='(--compare) Slowdown that '
+                        'counts as a regression if it is significant (its confidence interval is above zero) '
+                        '(default: %(default)s)')
+    parser.add_argument('--confidence', type=float, default=0.95, help='(--compare) Confidence level of the intervals '
+                        '(default: %(default)s)')
+    parser.add_argument('--bootstrap', type=int, default=1000, metavar='N', help='(--compare) Number of bootstrap '
+                        'resamples (default: %(default)s)')
+    parser.add_argument('--scaling', action='store_true', help='Fit --scaling-metric against --scaling-x (power law, '
+                        'on log-log scale) for each ConstellationVersion of reports in --dir and print the fits. '
+                        '--output writes the table of all reports with their flattened SimulationConfig (.csv, .json) '
+                        'or the plot (.png, .svg, .pdf)')
+    parser.add_argument('--scaling-x', default='Particles.ParticleCount', metavar='COLUMN', help='(--scaling) '
+                        'SimulationConfig field (Section.Field) or report column to scale by (default: %(default)s)')
+    parser.add_argument('--scaling-metric', default='AverageFrameTime', metavar='COLUMN', help='(--scaling) Statistic '
+                        'to fit, e.g. OneLowTime (default: %(default)s)')
+    parser.add_argument('--export-archive', metavar='PATH', help='Pack all reports in --dir into a single archive file '
+                        'and exit. The archive opens much faster than the directory')
     args = parser.parse_args()
 
-    app = ReportAnalyzer(args.dir)
+    if args.profile_trace is not None:
+        profiler.keep_events = True
+        atexit.register(profiler.write_trace, args.profile_trace)
+    # the GUI prints them after each refresh
+    if args.profile and (args.headless or args.compare or args.hitches or args.scaling or args.export_archive is not None):
+        atexit.register(lambda: print(profiler.report()))
+
+    if args.export_archive is not None:
+        if args.dir is None: parser.error('--export-archive requires --dir')
+        sys.exit(run_export_archive(args))
+
+    if args.query:
+        sys.exit(run_query(args))
+
+    if args.compare:
+        if args.baseline is None or args.candidate is None: parser.error('--compare requires --baseline and --candidate')
+        if not 0 < args.confidence < 1: parser.error('--confidence should be between 0 and 1')
+        sys.exit(run_compare(args))
+
+    if args.scaling:
+        if args.dir is None: parser.error('--scaling requires --dir')
+        sys.exit(run_scaling(args))
+
+    if args.hitches:
+        if args.dir is None: parser.error('--hitches requires --dir')
+        sys.exit(run_hitches(args))
+
+    if args.headless:
+        if args.dir is None: parser.error('--headless requires --dir')
+        sys.exit(run_headless(args))
+
+    memory_budget = int(args.memory_budget * 1024 * 1024) if args.memory_budget is not None else None
+    app = ReportAnalyzer(args.dir, use_cache=not args.no_cache, memory_budget=memory_budget,
+                         parse_workers=args.parse_workers,
+                         timings_dtype=np.float64 if args.float64 else np.float32, watch=args.watch,
+                         watch_interval=args.watch_interval, profile=args.profile,
+                         index=ReportIndex.open(args.index) if args.index is not None and not args.no_index else None)
     app.main()
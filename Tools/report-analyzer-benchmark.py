@@ -0,0 +1,440 @@
+"""Performance benchmarks of performance-report-analyzer.py on synthetic report trees.
+
+    report-analyzer-benchmark.py generate DIR [--depth 3 --reports 200 --frames 50000]
+        writes a tree of synthetic reports (ReportVersion 1.2.1, same layout as AnalyticsCore.DoSaveReport)
+    report-analyzer-benchmark.py run [--scale small --scale medium] [--output results.json] [--baseline old.json]
+        times loading, subtree building, composite data computation in each plot mode and rendering on generated trees,
+        optionally saving the results (to compare later runs against with --baseline)
+    report-analyzer-benchmark.py check
+        checks results of the analyzer (grouping of reports, scaling export) on small generated report trees
+"""
+
+import os
+import sys
+import json
+import math
+import shutil
+import argparse
+import subprocess
+import platform
+import statistics
+import tempfile
+import importlib.util
+from pathlib import Path
+from datetime import datetime
+from time import perf_counter
+import numpy as np
+
+TOOLS_DIR = Path(__file__).resolve().parent
+BENCHMARKS_DIR = TOOLS_DIR.parent / 'Json' / 'Benchmarks'
+RESULTS_VERSION = 1
+
+# report trees of each scale: `depth` directory levels (the last one is a suite run, like cross-benchmark `runN`),
+# about `reports` reports in total with `frames` frames each
+SCALES = {
+    'tiny': dict(depth=1, reports=18, frames=5000),
+    'small': dict(depth=2, reports=72, frames=20000),
+    'medium': dict(depth=3, reports=216, frames=50000),
+    'large': dict(depth=3, reports=864, frames=100000),
+}
+
+# plot options of the analyzer (defaults of ReportAnalyzer.main) and options of each benchmarked plot mode
+DEFAULT_OPTIONS = dict(smoothing_window=50, plot_distribution=False, log_density=False, sort_timings=False,
+                       plot_fps=False, fps_over_time=False, fps_interval=1.0, align_runs=False, align_interval=0.1,
+                       show_separators=False, time_axis=True, hide_raw=False, exclude_outliers=False,
+                       exclusion_threshold=0.8, detect_steady_state=False, trim_warmup=False)
+PLOT_MODES = {
+    'lines': {},
+    'sorted': dict(sort_timings=True),
+    'fps': dict(plot_fps=True),
+    'exclude outliers': dict(exclude_outliers=True),
+    'distribution': dict(plot_distribution=True),
+    'log distribution': dict(plot_distribution=True, log_density=True),
+    'fps over time': dict(fps_over_time=True),
+    'aligned runs': dict(align_runs=True),
+    'steady state': dict(detect_steady_state=True),
+    'trim warmup': dict(trim_warmup=True),
+}
+
+def load_analyzer():
+    "performance-report-analyzer.py can't be imported by name (dashes), so it's loaded from its path"
+    spec = importlib.util.spec_from_file_location('performance_report_analyzer', TOOLS_DIR / 'performance-report-analyzer.py')
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+###
+### Synthetic reports
+
+def read_suite(suite_dir):
+    "Returns [(base filename, benchmark name, simulation config), ...] of benchmarks in a BenchmarkSuite directory"
+    benchmarks = []
+    for path in sorted(Path(suite_dir).glob('*-benchmark.json')):
+        with open(path, 'r') as file:
+            config = json.load(file)
+        base_filename = path.name[:path.name.rindex('-')] # same as BenchmarkConfig.FromFile
+        config_path = path.parent / 'Configs' / f'{base_filename}.json'
+        simulation_config = json.load(open(config_path, 'r')) if config_path.is_file() else {}
+        benchmarks.append((base_filename, config.get('Name', base_filename), simulation_config))
+
+    return benchmarks
+
+def base_frame_time(simulation_config):
+    "Rough frame time (s) of a benchmark with `simulation_config`, so that benchmarks of a suite differ like real ones"
+    particles = simulation_config.get('Particles', {}).get('ParticleCount', 0)
+    visualizer = simulation_config.get('Visualizer', {})
+    frame_time = 0.0015 + particles * 2e-8
+    if visualizer.get('ShowLines'): frame_time += particles * 4e-8
+    if visualizer.get('ShowTriangles'): frame_time += particles * 6e-8
+    if visualizer.get('ShowParticles'): frame_time += particles * 1e-8
+    return frame_time
+
+def synthetic_timings(rng, frame_count, frame_time):
+    "Frame durations (s, float32): noisy frame time with a slow drift, periodic hitches and rare long frames"
+    timings = rng.gamma(30, frame_time / 30, frame_count)
+    timings *= 1 + 0.03 * np.sin(np.arange(frame_count) * (2 * np.pi / max(frame_count / 3, 1)) + rng.uniform(0, 2 * np.pi))
+    period = int(rng.integers(200, 2000))
+    timings[int(rng.integers(0, period))::period] *= rng.uniform(2, 5)
+    spikes = rng.random(frame_count) < 0.0005
+    timings[spikes] *= rng.uniform(5, 15, np.count_nonzero(spikes))
+    return timings.astype(np.float32)
+
+def frame_statistics_summary(timings):
+    "`Summary` field of a report, same as FrameStatistics.SetFrameTimings (seconds, float precision)"
+    total_duration = np.sum(timings, dtype=np.float32)
+    average_frame_time = total_duration / np.float32(len(timings))
+    descending = np.sort(timings)[::-1]
+    values = {
+        'TotalFrames': len(timings),
+        'TotalDuration': total_duration,
+        'AverageFPS': np.float32(1) / average_frame_time,
+        'AverageFrameTime': average_frame_time,
+        'FrameDurationStd': np.float32(np.std(timings, dtype=np.float64)),
+        'OneLowTime': descending[len(timings) // 100],
+        'PointOneLowTime': descending[len(timings) // 1000],
+        'LongestFrameTime': descending[0],
+    }
+    return { x: y if isinstance(y, int) else float(f'{y:.9g}') for x, y in values.items() }
+
+def write_report(path, timings, benchmark_name, simulation_config, version, device, suite):
+    report = {
+        'ReportVersion': '1.2.1',
+        'ConstellationVersion': version,
+        'ReportDateTime': datetime.now().strftime('%d.%m.%Y %H:%M:%S'),
+        'BuiltPlayer': True,
+        'DisplayResolution': { 'width': 1920, 'height': 1080, 'refreshRateRatio': { 'numerator': 60000, 'denominator': 1000 } },
+        'FullscreenMode': suite.get('FullscreenMode', 'FullScreenWindow'),
+        'BenchmarkConfigName': benchmark_name,
+        'CooldownDuration': suite.get('CooldownDurationOverride', 0),
+        'WarmupDuration': suite.get('WarmupDurationOverride', 0),
+        'DeviceModel': device,
+        'OperatingSystem': 'Windows 11  (10.0.22631) 64bit',
+        'ExecutableLocation': 'C:/Constellation/',
+        'Summary': frame_statistics_summary(timings),
+        'Timings': ', '.join('%.9g' % x for x in timings.tolist()), # "G9", like GenerateTimingsCsv
+        'SimulationConfig': simulation_config,
+    }
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=4)
+
+def generate_tree(root, depth=2, reports=36, frames=20000, suite_dir=BENCHMARKS_DIR / 'BaselineSuite', seed=0):
+    """Writes about `reports` synthetic reports to `root`, in `depth` levels of directories. Each directory of the last
+    level holds one run of the benchmark suite (RepeatCount reports of each benchmark, `<base>-<i>-report.json`).
+    Directories of other levels stand for devices and Constellation versions. Returns the number of reports written"""
+    rng = np.random.default_rng(seed)
+    with open(next(Path(suite_dir).glob('*-suite.json')), 'r') as file:
+        suite = json.load(file)
+    benchmarks = read_suite(suite_dir)
+    repeat_count = suite.get('RepeatCount', 1)
+    run_count = max(1, math.ceil(reports / (len(benchmarks) * repeat_count)))
+    fan_out = max(1, math.ceil(run_count ** (1 / depth)))
+    level_names = (['device', 'version'] * depth)[:depth - 1] + ['run']
+
+    written = 0
+    for run in range(run_count):
+        indices = [run // fan_out ** (depth - 1 - i) % fan_out for i in range(depth)] # mixed radix digits of `run`
+        directory = Path(root).joinpath(*[f'{name}{index + 1}' for name, index in zip(level_names, indices)])
+        directory.mkdir(parents=True, exist_ok=True)
+        device = f'Test PC {indices[0] + 1}' if depth > 1 else 'Test PC'
+        version = f'1.{indices[1] if depth > 2 else 0}.0'
+        speed = rng.lognormal(0, 0.1) # devices and versions differ in performance
+
+        for base_filename, name, simulation_config in benchmarks:
+            frame_time = base_frame_time(simulation_config) * speed
+            for i in range(repeat_count):
+                timings = synthetic_timings(rng, frames, frame_time * rng.lognormal(0, 0.02))
+                write_report(directory / f'{base_filename}-{i + 1}-report.json', timings, name, simulation_config,
+                             version, device, suite)
+                written += 1
+
+    return written
+
+###
+### Checks
+
+def check_grouping(analyzer, root, frames=2000):
+    """Checks that summary statistics and hitch analysis group runs of a benchmark together, in both report naming
+    styles: with a run index (`<base>-<i>-report.json`, BenchmarkSuite) and without one (`<base>-report.json`, single
+    benchmarks). Returns a list of failure descriptions"""
+    rng = np.random.default_rng(0)
+    benchmarks = read_suite(BENCHMARKS_DIR / 'BaselineSuite')[:3]
+    failures = []
+    for style, filenames in (('indexed', ['{}-1-report.json', '{}-2-report.json']), ('unindexed', ['{}-report.json'])):
+        for run in ('run1', 'run2'):
+            directory = Path(root) / style / run
+            directory.mkdir(parents=True, exist_ok=True)
+            for base_filename, name, simulation_config in benchmarks:
+                for filename in filenames:
+                    timings = synthetic_timings(rng, frames, base_frame_time(simulation_config))
+                    write_report(directory / filename.format(base_filename), timings, name, simulation_config, '1.0.0',
+                                 'Test PC', {})
+
+        store = analyzer.ReportDataStore(Path(root) / style, analyzer.REPORT_INDEX_REGEX, structure_only=True,
+                                         use_cache=False).load_contents()
+        store.wait_for_completion()
+        for pool_levels, group_count in (((), 2 * len(benchmarks)), ((1,), len(benchmarks))): # level 0 is `root`
+            _, group_rows = analyzer.compute_summary_statistics(store, pool_levels)
+            counts = sorted(x['ReportCount'] for x in group_rows)
+            expected = [len(filenames) * 2 * len(benchmarks) // group_count] * group_count
+            if counts != expected:
+                failures.append(f'{style} reports, pool levels {pool_levels}: groups of {counts} reports, '
+                                f'expected {expected}')
+            hitch_groups = analyzer.compute_hitch_statistics(store, pool_levels)[0]
+            if sorted(x['Group'] for x in hitch_groups) != sorted(x['Group'] for x in group_rows):
+                failures.append(f'{style} reports, pool levels {pool_levels}: hitch groups differ from summary groups')
+
+    return failures
+
+def check_scaling_export(root, frames=2000):
+    """Checks that `--scaling --output` writes a row for every report of a generated tree (simulation configs of a
+    real suite have columns that are null in every report). Returns a list of failure descriptions"""
+    count = generate_tree(Path(root) / 'scaling', depth=1, reports=1, frames=frames)
+    output = Path(root) / 'scaling.csv'
+    result = subprocess.run([sys.executable, str(TOOLS_DIR / 'performance-report-analyzer.py'), '--dir',
+                             str(Path(root) / 'scaling'), '--scaling', '--no-index', '--output', str(output)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if not output.is_file():
+        return [f'scaling export: no output written (exit code {result.returncode}) {result.stderr.strip()[-300:]}']
+    with open(output, 'r', newline='') as file:
+        rows = len(file.readlines()) - 1
+    return [] if rows == count else [f'scaling export: {rows} rows written, expected {count}']
+
+def run_checks(args):
+    analyzer = load_analyzer()
+    root = Path(tempfile.mkdtemp(prefix='report-analyzer-check-'))
+    try:
+        failures = check_grouping(analyzer, root) + check_scaling_export(root)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    for failure in failures: print(f'FAILED: {failure}')
+    print('All checks passed' if len(failures) == 0 else f'{len(failures)} checks failed')
+    return 0 if len(failures) == 0 else 1
+
+###
+### Benchmarks
+
+class Value:
+    "Stand-in for Tk variables of the analyzer"
+    def __init__(self, value): self.value = value
+    def get(self): return self.value
+    def set(self, value): self.value = value
+
+class StatusLabel:
+    def __init__(self): self.text = None
+    def config(self, text=None, **kwargs): self.text = text
+
+def make_analyzer(analyzer, store, options):
+    """ReportAnalyzer without a window: plot options are a dict and group selectors are plain values. All groups are
+    selected, benchmarks (second to last level of group chains) are plotted on separate subplots"""
+    app = analyzer.ReportAnalyzer(None)
+    app.var_store = dict(DEFAULT_OPTIONS, **options)
+    app.reports_store = store
+    app.status_label = StatusLabel()
+    tags = ['Auto'] * len(store.groups)
+    tags[-2] = 'Plot each'
+    app.report_groups = [analyzer.ReportGroupData(values, Value('-'), None, None, Value(tag), None)
+                         for values, tag in zip(store.groups, tags)]
+    return app
+
+def measure(function, repeat, setup=lambda: None):
+    "Runs `function(setup())` `repeat` times. Only `function` is timed"
+    times = []
+    for _ in range(repeat):
+        state = setup()
+        start = perf_counter()
+        function(state)
+        times.append(perf_counter() - start)
+
+    return { 'median': statistics.median(times), 'min': min(times), 'runs': times }
+
+def remove_caches(root, cache_dirname):
+    for path in list(Path(root).rglob(cache_dirname)): shutil.rmtree(path)
+
+def run_scale(analyzer, root, repeat, size=(16, 9), dpi=100):
+    "Runs all benchmarks on the report tree at `root`. Returns { benchmark name: measurement }"
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    regex = analyzer.REPORT_INDEX_REGEX
+    results = {}
+    def run(name, function, setup=lambda: None):
+        analyzer.profiler.reset()
+        results[name] = measure(function, repeat, setup)
+        results[name]['stages'] = { x: y[0] for x, y in analyzer.profiler.totals.items() } # of the last run
+        print(f'  {name:<32} {results[name]["median"] * 1000:>10.1f} ms')
+
+    def load_store(use_cache):
+        store = analyzer.ReportDataStore(root, regex, structure_only=True, use_cache=use_cache).load_contents()
+        store.wait_for_completion()
+        return store
+
+    # cold start of the analyzer in a new process, mostly imports
+    script = [sys.executable, str(TOOLS_DIR / 'performance-report-analyzer.py')]
+    run('startup: --help', lambda _: subprocess.run(script + ['--help'], stdout=subprocess.DEVNULL, check=True))
+    run('startup: headless', lambda _: subprocess.run(script + ['--dir', str(root), '--headless', '--no-index'],
+                                                      stdout=subprocess.DEVNULL, check=True))
+
+    remove_caches(root, analyzer.REPORT_CACHE_DIRNAME)
+    run('load headers', lambda _: load_store(False))
+    run('decode timings (parse)', lambda store: store.load_timings(), lambda: load_store(False))
+    load_store(True).load_timings() # fills the cache
+    run('load headers (cached)', lambda _: load_store(True))
+    run('decode timings (cached)', lambda store: store.load_timings(), lambda: load_store(True))
+
+    store = load_store(True).load_timings()
+    depth = store.depth
+    run('build subtree', lambda _: store.build_subtree([None] * depth, compress=False))
+    run('build subtree (selection)', lambda _: store.build_subtree([None] * (depth - 2) + [store.groups[-2][0], None]))
+    run('transpose groups', lambda _: store.transpose_groups(list(range(depth))[::-1]))
+    run('headless statistics', lambda _: analyzer.compute_summary_statistics(store))
+    run('hitch analysis', lambda _: analyzer.compute_hitch_statistics(store))
+    run('scaling table', lambda _: analyzer.scaling_table(store))
+
+    def make_plotter():
+        figure = Figure(figsize=size, dpi=dpi)
+        FigureCanvasAgg(figure)
+        return analyzer.CompositePlotter(figure)
+
+    for mode, options in PLOT_MODES.items():
+        app = make_analyzer(analyzer, store, options)
+        def compute(_, app=app):
+            app.pipeline_cache = analyzer.PipelineCache() # measure computation, not the memoization
+            return app.prepare_composite_data()
+        run(f'compute: {mode}', compute)
+
+        data, plot_options = compute(None), dict(DEFAULT_OPTIONS, **options)
+        run(f'render: {mode}', lambda plotter: plotter.draw(data, plot_options), make_plotter)
+
+    # redraw after an option that only changes the data (subplots are updated in place)
+    app = make_analyzer(analyzer, store, {})
+    data = app.prepare_composite_data()
+    app.var_store['smoothing_window'] = 200
+    smoothed_data = app.prepare_composite_data()
+    def make_drawn_plotter():
+        plotter = make_plotter()
+        plotter.draw(data, DEFAULT_OPTIONS)
+        return plotter
+    run('render update: lines', lambda plotter: plotter.draw(smoothed_data, DEFAULT_OPTIONS), make_drawn_plotter)
+
+    archive_path = Path(root).parent / f'{Path(root).name}.rpa'
+    run('export archive', lambda _: analyzer.ReportArchive.write(archive_path, store))
+    run('open archive', lambda _: analyzer.ReportDataStore(archive_path, regex, structure_only=True))
+    archive_path.unlink()
+
+    return results
+
+def environment_info():
+    import matplotlib
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def print_comparison(results, baseline):
+    "Prints median times of `results` relative to `baseline` (both in the format written by `run --output`)"
+    print(f'\n{"Scale / benchmark":<44} {"Baseline":>12} {"Current":>12} {"Ratio":>8}')
+    for scale, benchmarks in results['scales'].items():
+        baseline_benchmarks = baseline['scales'].get(scale, {}).get('benchmarks', {})
+        for name, result in benchmarks['benchmarks'].items():
+            if name not in baseline_benchmarks: continue
+            old, new = baseline_benchmarks[name]['median'], result['median']
+            ratio = new / old if old > 0 else math.inf
+            mark = ' slower' if ratio > 1.1 else ' faster' if ratio < 1 / 1.1 else ''
+            print(f'{scale + " / " + name:<44} {old * 1000:>9.1f} ms {new * 1000:>9.1f} ms {ratio:>8.2f}{mark}')
+
+def run_benchmarks(args):
+    analyzer = load_analyzer()
+    scales = { x: SCALES[x] for x in args.scale or ['small'] }
+    if args.reports is not None: # custom scale
+        scales = { 'custom': dict(depth=args.depth, reports=args.reports, frames=args.frames) }
+
+    work_dir = Path(args.work_dir) if args.work_dir is not None else Path(tempfile.mkdtemp(prefix='report-analyzer-benchmark-'))
+    results = { 'version': RESULTS_VERSION, 'environment': environment_info(), 'repeat': args.repeat, 'scales': {} }
+    try:
+        for scale, parameters in scales.items():
+            root = work_dir / scale
+            parameters_path = work_dir / f'{scale}.json'
+            if not parameters_path.is_file() or json.load(open(parameters_path, 'r')) != parameters:
+                print(f'Generating {scale} report tree...')
+                shutil.rmtree(root, ignore_errors=True)
+                generate_tree(root, **parameters)
+                with open(parameters_path, 'w') as file: json.dump(parameters, file)
+
+            print(f'Scale `{scale}` ({parameters["reports"]} reports, {parameters["frames"]} frames each):')
+            results['scales'][scale] = { 'parameters': parameters, 'benchmarks': run_scale(analyzer, root, args.repeat) }
+    finally:
+        if args.work_dir is None: shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as file:
+            print_comparison(results, json.load(file))
+
+    return 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of the report analyzer on synthetic reports')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate = commands.add_parser('generate', help='Write a tree of synthetic reports')
+    generate.add_argument('dir', help='Output directory')
+    generate.add_argument('--depth', type=int, default=2, help='Number of directory levels above the reports')
+    generate.add_argument('--reports', type=int, default=36, help='Approximate number of reports')
+    generate.add_argument('--frames', type=int, default=20000, help='Frames per report')
+    generate.add_argument('--suite', default=BENCHMARKS_DIR / 'BaselineSuite', help='Benchmark suite directory to take '
+                          'benchmark names and simulation configs from')
+    generate.add_argument('--seed', type=int, default=0)
+
+    run = commands.add_parser('run', help='Run benchmarks')
+    run.add_argument('--scale', action='append', choices=list(SCALES), help='Report tree size (default: small). '
+                     'Can be specified multiple times')
+    run.add_argument('--depth', type=int, default=2, help='(with --reports) Directory levels of a custom tree')
+    run.add_argument('--reports', type=int, help='Run on a custom tree with this many reports instead of --scale')
+    run.add_argument('--frames', type=int, default=20000, help='(with --reports) Frames per report of a custom tree')
+    run.add_argument('--repeat', type=int, default=3, help='Runs of each benchmark, the median is reported')
+    run.add_argument('--work-dir', help='Keep generated reports in this directory (and reuse them next time) instead '
+                     'of a temporary one')
+    run.add_argument('--output', help='Write results to this json file')
+    run.add_argument('--baseline', help='Compare results with this file, written by an earlier run with --output')
+
+    commands.add_parser('check', help='Check results of the analyzer on small generated report trees')
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        count = generate_tree(args.dir, args.depth, args.reports, args.frames, args.suite, args.seed)
+        print(f'Generated {count} reports in {args.dir}')
+        sys.exit(0)
+
+    if args.command == 'check':
+        sys.exit(run_checks(args))
+
+    sys.exit(run_benchmarks(args))